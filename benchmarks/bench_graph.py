@@ -0,0 +1,52 @@
+# Times building a FlowGraph over a large model and querying it
+#   python benchmarks/bench_graph.py [flows] [entities]
+import logging
+import random
+import sys
+import time
+
+from fluentm.entities import Boundary, Data, DataFlow, HTTP, Process, TLS
+from fluentm.graph import FlowGraph
+
+logging.disable(logging.WARNING)
+
+
+def build(count, entities):
+    rng = random.Random(1)
+    processes = [
+        Process(f"Service {i}").inBoundary(Boundary(f"Zone {i % 50}"))
+        for i in range(entities)
+    ]
+    flows = []
+    for i in range(count):
+        data = TLS(HTTP(Data(f"Record {i % 5000}")))
+        flows.append(DataFlow(rng.choice(processes), rng.choice(processes), data))
+    return {"Scene": flows}
+
+
+def timed(label, fn, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    print(f"{label}: {(time.perf_counter() - start) / repeat * 1000:.1f} ms")
+    return result
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    entities = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+
+    scenes = build(count, entities)
+    g = timed(
+        f"build ({count} flows, {entities} entities)", lambda: FlowGraph(scenes), 1
+    )
+
+    source, target = Process.get("Service 0"), Process.get(f"Service {entities - 1}")
+    timed("reachable", lambda: g.reachable(source))
+    timed("reachable from a boundary", lambda: g.reachable(Boundary.get("Zone 0")))
+    timed("shortestPath", lambda: g.shortestPath(source, target))
+    timed("lineage", lambda: g.lineage(Data.get("Record 0")))
+    timed(
+        "first 100 paths",
+        lambda: [p for _, p in zip(range(100), g.paths(source, target, 6))],
+    )
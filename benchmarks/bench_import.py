@@ -0,0 +1,25 @@
+# Reports how long it takes to import fluentm modules in a fresh interpreter, best of 5
+#   python benchmarks/bench_import.py [module ...]
+import subprocess
+import sys
+
+MODULES = ["fluentm.entities", "fluentm.renderer", "graphviz", "jinja2"]
+
+
+def importTime(module):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1000
+
+
+if __name__ == "__main__":
+    for module in sys.argv[1:] or MODULES:
+        best = min(importTime(module) for _ in range(5))
+        print(f"{module}: {best:.1f} ms")
@@ -0,0 +1,48 @@
+# Times linting a large model against hundreds of rules
+#   python benchmarks/bench_linter.py [flows] [rules]
+import sys
+import time
+
+from bench_memory import build
+from fluentm.entities import Classification, WrappableProtocol
+from fluentm.linter import DEFAULT_RULES, Rule, lint
+
+
+# A mix of rule shapes, most of which match little or nothing as in a real rule set
+def rules(count):
+    generated = list(DEFAULT_RULES)
+    protocols = WrappableProtocol.__subclasses__()
+    while len(generated) < count:
+        n = len(generated)
+        if n % 3 == 0:
+            protocol = protocols[(n // 3) % len(protocols)]
+            rule = Rule(f"protocol-{n}", "Protocol", over="protocol", key=protocol)
+        elif n % 3 == 1:
+            rule = Rule(
+                f"crossing-{n}",
+                "Old TLS crossing a boundary",
+                over="crossing",
+                check=lambda f: f.wrappedData.version == "1.0",
+            )
+        else:
+            rule = Rule(
+                f"topsecret-{n}",
+                "Top secret data",
+                over="classification",
+                key=Classification.TOPSECRET,
+            )
+        generated.append(rule)
+    return generated
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    ruleCount = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+
+    scenes = {"Scene": build(count)}
+    ruleset = rules(ruleCount)
+
+    start = time.perf_counter()
+    findings = lint(scenes, ruleset)
+    elapsed = time.perf_counter() - start
+    print(f"{count} flows, {ruleCount} rules: {elapsed:.2f}s, {len(findings)} findings")
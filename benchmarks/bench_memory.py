@@ -0,0 +1,46 @@
+# Measures the memory held by a model of 100k DataFlows
+#   python benchmarks/bench_memory.py [flows]
+import gc
+import logging
+import sys
+import tracemalloc
+
+from fluentm.entities import Actor, Boundary, DataFlow, HTTP, Process, SQL, TLS
+
+logging.disable(logging.WARNING)
+
+
+def build(count):
+    Actor("Customer").inBoundary(Boundary("Internet"))
+    processes = [
+        Process(f"Service {i}").inBoundary(Boundary(f"Zone {i % 10}"))
+        for i in range(100)
+    ]
+
+    flows = []
+    for i in range(count):
+        pitcher = processes[i % len(processes)]
+        catcher = processes[(i * 7 + 1) % len(processes)]
+        if i % 3 == 0:
+            data = TLS(HTTP(f"Request {i % 1000}"))
+        elif i % 3 == 1:
+            data = SQL(f"Query {i % 1000}")
+        else:
+            data = HTTP(f"Event {i % 1000}")
+        flows.append(DataFlow(pitcher, catcher, data, response=TLS("OK")))
+    return flows
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    flows = build(count)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(f"{count} flows: {(after - before) / 2**20:.1f} MiB")
+    print(f"{(after - before) / count:.0f} bytes per flow")
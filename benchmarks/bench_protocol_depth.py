@@ -0,0 +1,32 @@
+# Times walking deeply nested protocol chains e.g generated tunnelling chains
+#   python benchmarks/bench_protocol_depth.py [depth ...]
+import sys
+import time
+
+from fluentm.entities import HTTP, TLS
+
+
+def build(depth):
+    layer = HTTP(f"Payload {depth}")
+    for _ in range(depth - 1):
+        layer = TLS(layer)
+    return layer
+
+
+if __name__ == "__main__":
+    depths = [int(d) for d in sys.argv[1:]] or [1_000, 10_000, 100_000]
+    for depth in depths:
+        start = time.perf_counter()
+        chain = build(depth)
+        built = time.perf_counter()
+        chain.getNestedData()
+        walked = time.perf_counter()
+        chain.getTransportChain()
+        chain.flatString()
+        chain.flatDotRecordString()
+        flattened = time.perf_counter()
+        print(
+            f"depth {depth}: build {built - start:.3f}s,"
+            f" getNestedData {walked - built:.3f}s,"
+            f" flatten {flattened - walked:.3f}s"
+        )
@@ -0,0 +1,47 @@
+# Times building entities into one registry from many threads, and checks none were duplicated
+#   python benchmarks/bench_threads.py [entities] [threads]
+from concurrent.futures import ThreadPoolExecutor
+import sys
+import time
+
+from fluentm.entities import Boundary, Process
+from fluentm.registry import Registry
+
+
+# Each thread creates its share of the entities and then the next thread's share as well, so
+# every entity is raced for by two threads
+def build(r, count, threads, t):
+    share = count // threads
+    with r:
+        for j in range(t * share, (t + 2) * share):
+            i = j % count
+            Process(f"Service {i}").inBoundary(Boundary(f"Zone {i % 1000}"))
+
+
+def timed(count, threads):
+    r = Registry()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(
+            pool.map(
+                build,
+                [r] * threads,
+                [count] * threads,
+                [threads] * threads,
+                range(threads),
+            )
+        )
+    elapsed = time.perf_counter() - start
+
+    assert len(r.assets("Process")) == count // threads * threads
+    assert len(r.assets("Boundary")) == min(count, 1000)
+    print(f"{threads} threads: {elapsed:.2f}s ({count * 2 / elapsed:,.0f} entities/s)")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+
+    print(f"{count} entities")
+    timed(count, 1)
+    timed(count, threads)
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024  # 256MB
+
+# Eviction trims the cache to this fraction of maxBytes, so that a full cache isn't scanned again
+# on every store
+LOW_WATER = 0.8
+
+
+# On-disk store of rendered diagrams keyed by a hash of their DOT source and output format.
+# An unchanged diagram is copied out of the cache rather than handed to graphviz again.
+# The modification time of an entry is bumped every time it is used, when the cache grows
+# past maxBytes the least recently used entries are removed until it is back under LOW_WATER.
+class RenderCache(object):
+    def __init__(self, directory: str, maxBytes: int = DEFAULT_CACHE_SIZE):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = None  # Bytes on disk, measured on first store
+        self._lock = threading.Lock()
+
+    def key(self, source: str, format: str, engine: str = "dot"):
+        digest = hashlib.sha256(f"{engine}\0{format}\0".encode("utf-8"))
+        digest.update(source.encode("utf-8"))
+        return digest.hexdigest()
+
+    def path(self, key: str, format: str):
+        return os.path.join(self.directory, key[:2], f"{key}.{format}")
+
+    # Copy a cached artifact to dest, returns False if there isn't one
+    def fetch(self, key: str, format: str, dest: str):
+        cached = self.path(key, format)
+        try:
+            os.utime(cached)
+            os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+            shutil.copyfile(cached, dest)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return False
+
+        with self._lock:
+            self.hits += 1
+        return True
+
+    # Add a freshly rendered file to the cache
+    def store(self, key: str, format: str, rendered: str):
+        cached = self.path(key, format)
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+
+        # Copy then rename so that a concurrent fetch never sees a partial file. The cache can be
+        # shared by several processes, so the temporary file needs a name unique across them.
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(cached))
+        os.close(fd)
+        shutil.copyfile(rendered, tmp)
+        os.replace(tmp, cached)
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += os.path.getsize(cached)
+            if self._size > self.maxBytes:
+                self._evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                p = os.path.join(root, name)
+                try:
+                    st = os.stat(p)
+                except FileNotFoundError:
+                    continue
+                yield p, st.st_size, st.st_mtime
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda e: e[2])  # Oldest first
+        self._size = sum(size for _, size, _ in entries)
+        for p, size, _ in entries:
+            if self._size <= self.maxBytes * LOW_WATER:
+                break
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+            self._size -= size
+            self.evictions += 1
+
+    def counts(self):
+        with self._lock:
+            return (self.hits, self.misses, self.evictions)
+
+    # since is an earlier counts(), to summarise only what happened after it
+    def summary(self, since=(0, 0, 0)):
+        hits, misses, evictions = (n - m for n, m in zip(self.counts(), since))
+        total = hits + misses
+        rate = 100 * hits / total if total else 0
+        return (
+            f"Render cache: {hits} hits, {misses} misses ({rate:.0f}% hit rate),"
+            f" {evictions} evicted"
+        )
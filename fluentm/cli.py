@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import glob
+import logging
+import os
+import sys
+import time
+import traceback
+
+from fluentm.model import Model
+from fluentm.renderer import FORMATS
+
+
+# Whether module was imported from directory: a module directly in it or part of a package that
+# is, not e.g a package installed in a virtualenv below it. fluentm itself never counts, even for
+# a model kept in a checkout of it.
+def _isLocal(module, directory: str):
+    path = getattr(module, "__file__", None)
+    if path is None or module.__name__.split(".")[0] == "fluentm":
+        return False
+    depth = module.__name__.count(".") + 1
+    if os.path.splitext(os.path.basename(path))[0] == "__init__":
+        depth += 1
+    for _ in range(depth):
+        path = os.path.dirname(path)
+    return path == directory
+
+
+# Runs a model and writes its report to outputDir, returning the names of its scenes. Only the
+# modules the model newly imports from its own directory are tracked. They are forgotten again
+# once it has run, so the next model run in this process, or the next build of this one, imports
+# its own copy. Their files are added to imported, if it's given.
+def buildModel(model: str, outputDir: str, imported: dict = None, **reportOptions):
+    modelDir = os.path.dirname(os.path.abspath(model))
+    before = set(sys.modules)
+    sys.path.insert(0, modelDir)
+    try:
+        m = Model.load(model)
+    finally:
+        sys.path.remove(modelDir)
+        for name in set(sys.modules) - before:
+            module = sys.modules[name]
+            if _isLocal(module, modelDir):
+                if imported is not None:
+                    imported[name] = os.path.abspath(module.__file__)
+                del sys.modules[name]
+
+    m.report(outputDir, **reportOptions)
+    return list(m.scenes)
+
+
+# Keeps a model's report up to date as its source changes.
+#   Watcher("model.py", "out").run()
+# The model file, and any module next to it that the model imports, is polled for changes. On a
+# change the model is run again in a fresh Registry and report(incremental=True) re-renders only
+# the scenes whose fingerprint changed since the last build.
+class Watcher(object):
+    def __init__(self, model: str, outputDir: str, interval=0.5, **reportOptions):
+        self.model = os.path.abspath(model)
+        self.outputDir = outputDir
+        self.interval = interval
+        self.reportOptions = reportOptions
+        self.imported = {}  # Local modules the model imports, by name
+        self.mtimes = {}
+
+    def files(self):
+        return [self.model] + sorted(set(self.imported.values()))
+
+    def _snapshot(self):
+        mtimes = {}
+        for f in self.files():
+            try:
+                mtimes[f] = os.stat(f).st_mtime_ns
+            except FileNotFoundError:
+                mtimes[f] = None
+        return mtimes
+
+    def changed(self):
+        return self._snapshot() != self.mtimes
+
+    # Run the model and report it, returns False if the model failed
+    def build(self):
+        imported = {}
+        try:
+            buildModel(
+                self.model,
+                self.outputDir,
+                imported=imported,
+                incremental=True,
+                **self.reportOptions,
+            )
+        except Exception:
+            # A module that failed to import isn't known any more, keep watching it
+            self.imported.update(imported)
+            logging.exception(f"Failed to build {self.model}")
+            return False
+        else:
+            self.imported = imported
+        finally:
+            self.mtimes = self._snapshot()
+
+        logging.info(f"Built {self.model} into {self.outputDir}")
+        return True
+
+    def run(self, once=False):
+        ok = self.build()
+        while not once:
+            time.sleep(self.interval)
+            if self.changed():
+                ok = self.build()
+        return ok
+
+
+def watch(args):
+    watcher = Watcher(
+        args.model,
+        args.output,
+        interval=args.interval,
+        workers=args.workers,
+        format=args.format,
+    )
+    try:
+        return 0 if watcher.run(once=args.once) else 1
+    except KeyboardInterrupt:
+        return 0
+
+
+# Runs in a worker process of its own, so models can't see each other's entities. Failures are
+# returned as text because whatever a model raises may not survive being pickled.
+def _buildWorker(model: str, outputDir: str, reportOptions: dict):
+    try:
+        return buildModel(model, outputDir, **reportOptions), None
+    except Exception:
+        return None, traceback.format_exc()
+
+
+def _modelName(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+# Builds every model matching the given globs concurrently, each into a directory of the same name
+# as the model under outputDir, and writes an index.html linking to their reports. Returns the
+# models, each with the scenes it built or the error it failed with.
+def buildModels(patterns, outputDir: str, workers=None, split=False, **reportOptions):
+    paths = sorted(
+        {os.path.abspath(p) for pattern in patterns for p in glob.glob(pattern)}
+    )
+    models = [
+        {"name": _modelName(p), "path": p, "scenes": [], "error": None} for p in paths
+    ]
+    names = [m["name"] for m in models]
+    assert len(set(names)) == len(names), "Model names must be unique"
+
+    page = "index.html" if split else "ThreatModel.html"
+    reportOptions["split"] = split
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for model in models:
+            model["page"] = f"{model['name']}/{page}"
+            out = os.path.join(outputDir, model["name"])
+            futures[pool.submit(_buildWorker, model["path"], out, reportOptions)] = (
+                model
+            )
+
+        for future in concurrent.futures.as_completed(futures):
+            model = futures[future]
+            try:
+                model["scenes"], model["error"] = future.result()
+            except Exception as e:  # The worker itself died
+                model["error"] = repr(e)
+            if model["error"] is None:
+                logging.info(f"Built {model['path']}")
+            else:
+                logging.error(f"Failed to build {model['path']}\n{model['error']}")
+
+    from jinja2 import PackageLoader, Environment
+
+    env = Environment(loader=PackageLoader("fluentm", "templates"))
+    os.makedirs(outputDir, exist_ok=True)
+    with open(os.path.join(outputDir, "index.html"), "w") as f:
+        env.get_template("models.html").stream(title="Models", models=models).dump(f)
+    return models
+
+
+def build(args):
+    if not any(glob.glob(pattern) for pattern in args.models):
+        logging.error(f"No models match {' '.join(args.models)}")
+        return 1
+    models = buildModels(
+        args.models,
+        args.output,
+        workers=args.workers,
+        split=args.split,
+        format=args.format,
+    )
+    failed = [m for m in models if m["error"] is not None]
+    logging.info(f"Built {len(models) - len(failed)} of {len(models)} models")
+    return 1 if failed else 0
+
+
+def parser():
+    p = argparse.ArgumentParser(prog="fluentm", description="Threat models as code")
+    commands = p.add_subparsers(dest="command", required=True)
+
+    w = commands.add_parser("watch", help="Re-render a model's report when it changes")
+    w.add_argument("model", help="Python file that defines scenes")
+    w.add_argument("-o", "--output", required=True, help="Directory for the report")
+    w.add_argument("--interval", type=float, default=0.5, help="Seconds between polls")
+    w.add_argument("--workers", type=int, default=None, help="Concurrent renders")
+    w.add_argument("--format", choices=FORMATS, default="png")
+    w.add_argument("--once", action="store_true", help="Build once and exit")
+    w.set_defaults(func=watch)
+
+    b = commands.add_parser("build", help="Render several models at once")
+    b.add_argument("models", nargs="+", help="Model files or globs e.g 'examples/*.py'")
+    b.add_argument("-o", "--output", required=True, help="Directory for the reports")
+    b.add_argument("--workers", type=int, default=None, help="Models built at once")
+    b.add_argument("--format", choices=FORMATS, default="png")
+    b.add_argument("--split", action="store_true", help="A page per scene")
+    b.set_defaults(func=build)
+    return p
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    args = parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
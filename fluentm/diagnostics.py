@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import logging
+import os
+import sys
+import threading
+
+HELP = "See https://github.com/hyakuhei/fluentm/blob/main/help.md"
+
+MESSAGES = {
+    "string-data": f"DataFlow using 'string' for data. Assuming plaintext wrapping. {HELP}",
+    "data-data": f"DataFlow using 'Data'. Assuming plaintext wrapping. {HELP}",
+}
+
+
+# Collects warnings about a model as it is built, counted by the line of the model that caused
+# them, rather than logging every one. report() emits a single summary once it has finished.
+#   if diagnostics.enabled:
+#       diagnostics.record("string-data")
+# Set diagnostics.enabled = False to skip collecting altogether. Models can be built from several
+# threads at once, counts are updated holding a lock.
+class Diagnostics(object):
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.events = {}  # (code, filename, line) -> count
+        self._lock = threading.Lock()
+
+    # depth is how many frames above the caller the call site is, 1 is the caller's caller
+    def record(self, code: str, depth: int = 1):
+        frame = sys._getframe(depth + 1)
+        key = (code, frame.f_code.co_filename, frame.f_lineno)
+        with self._lock:
+            self.events[key] = self.events.get(key, 0) + 1
+
+    def count(self, code: str = None):
+        with self._lock:
+            return sum(n for key, n in self.events.items() if code in (None, key[0]))
+
+    def summary(self):
+        with self._lock:
+            events = dict(self.events)
+        return _summary(events)
+
+    # Log the summary, if anything was recorded, and start counting again
+    def emit(self, logger=logging):
+        with self._lock:
+            events, self.events = self.events, {}
+        if events:
+            logger.warning(_summary(events))
+
+
+def _summary(events: dict):
+    lines = [f"{sum(events.values())} model warnings"]
+    byCode = {}
+    for (code, filename, line), n in events.items():
+        byCode.setdefault(code, []).append((filename, line, n))
+
+    for code, sites in byCode.items():
+        lines.append(MESSAGES.get(code, code))
+        for filename, line, n in sites:
+            lines.append(f"    {os.path.relpath(filename)}:{line} ({n} times)")
+    return "\n".join(lines)
+
+
+diagnostics = Diagnostics()
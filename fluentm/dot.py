@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import re
+
+# Writes DFDs as DOT text directly from a list of DataFlows, without building graphviz objects.
+# The output matches what the graphviz package produces for the same graph byte for byte, so
+# the quoting rules below mirror graphviz.lang.
+
+_HTML_STRING = re.compile(r"<.*>$", re.DOTALL)
+_ID = re.compile(r"([a-zA-Z_][a-zA-Z0-9_]*|-?(\.[0-9]+|[0-9]+(\.[0-9]*)?))$")
+_KEYWORDS = {"node", "edge", "graph", "digraph", "subgraph", "strict"}
+_UNESCAPED_QUOTES = re.compile(r'(?P<bs>(?:\\\\)*)\\?(?P<quote>")')
+
+GRAPH_ATTR = {"rankdir": "LR", "color": "blue", "fontname": "Arial"}
+NODE_ATTR = {"fontname": "Arial", "fontsize": "11", "shape": "box", "style": "rounded"}
+EDGE_ATTR = {"fontname": "Arial", "fontsize": "11"}
+CLUSTER_ATTR = {
+    "fontname": "Arial",
+    "fontsize": "11",
+    "color": "red",
+    "style": "dashed",
+}
+
+
+# Return a DOT identifier, quoted if needed
+def quote(identifier: str):
+    if _HTML_STRING.match(identifier):
+        return identifier
+    if not _ID.match(identifier) or identifier.lower() in _KEYWORDS:
+        return '"%s"' % _UNESCAPED_QUOTES.sub(r"\g<bs>\\\g<quote>", identifier)
+    return identifier
+
+
+# Edge endpoints may carry a port and compass point e.g "node:port:n"
+def quoteEdge(identifier: str):
+    node, _, rest = identifier.partition(":")
+    parts = [quote(node)]
+    if rest:
+        port, _, compass = rest.partition(":")
+        parts.append(quote(port))
+        if compass:
+            parts.append(compass)
+    return ":".join(parts)
+
+
+def aList(label=None, attrs=None):
+    result = [f"label={quote(label)}"] if label is not None else []
+    if attrs:
+        result.extend(f"{quote(k)}={quote(v)}" for k, v in sorted(attrs.items()))
+    return " ".join(result)
+
+
+def attrList(label=None, attrs=None):
+    content = aList(label, attrs)
+    return f" [{content}]" if content else ""
+
+
+class _Cluster(object):
+    def __init__(self, boundary, parent, order: int):
+        self.boundary = boundary
+        self.parent = parent  # The parent Boundary, None for the outermost
+        self.order = order
+        self.nodes = []
+        self.children = []
+
+
+# Lays out the DFD of a list of flows and yields its DOT source line by line.
+#   DfdWriter("Scene").write(flows, f)
+# Nodes and clusters need every flow to be seen before they can be written, the labelled edges
+# are then generated by a second pass over flows rather than being held in memory.
+class DfdWriter(object):
+    def __init__(self, title: str, dfdLabels=True, simplified=False):
+        self.title = title
+        self.dfdLabels = dfdLabels
+        self.simplified = simplified
+
+    def lines(self, flows):
+        yield f"digraph {quote(self.title)} {{"
+        yield from self.body(flows)
+        yield "}"
+
+    # Everything between the braces, the same lines graphviz keeps in Digraph.body
+    def body(self, flows):
+        if not self.simplified and iter(flows) is flows:
+            flows = list(flows)  # A one-shot iterator can't be walked twice
+
+        topLevel, clusters, edges = self._layout(flows)
+
+        yield f"\t{aList(None, GRAPH_ATTR)}"
+        yield f"\tnode{attrList(None, NODE_ATTR)}"
+        yield f"\tedge{attrList(None, EDGE_ATTR)}"
+
+        for name in topLevel:
+            yield f"\t{quote(name)}"
+        for cluster in clusters:
+            if cluster.parent is None:
+                yield from self._cluster(cluster, "\t")
+
+        if self.simplified:
+            for (pitcher, catcher), direction in edges.items():
+                attrs = attrList(None, {"dir": direction})
+                yield f"\t{quoteEdge(pitcher)} -> {quoteEdge(catcher)}{attrs}"
+        else:
+            for flowCounter, flow in enumerate(flows, start=1):
+                if self.dfdLabels is True:
+                    label = f"({flowCounter}) {flow.name}"
+                else:
+                    label = f"({flowCounter})"
+                pitcher, catcher = flow.pitcher.name, flow.catcher.name
+                yield f"\t{quoteEdge(pitcher)} -> {quoteEdge(catcher)}{attrList(label)}"
+
+    def write(self, flows, out):
+        for line in self.lines(flows):
+            out.write(line)
+            out.write("\n")
+
+    def source(self, flows):
+        return "\n".join(self.lines(flows))
+
+    # One pass over flows to find where every node goes, which clusters exist and (when
+    # simplified) which edges are single or double ended.
+    def _layout(self, flows):
+        topLevel = []
+        clusters = {}
+        placed = set()
+        edges = {}
+
+        for flow in flows:
+            for e in (flow.pitcher, flow.catcher):
+                if e.name in placed:
+                    continue
+                placed.add(e.name)
+
+                if hasattr(e, "boundary"):
+                    tree = e._registry.boundaryTree()
+                    for b in tree.chain(e.boundary):
+                        if b in clusters:
+                            break  # Everything b is nested in has a cluster already
+                        clusters[b] = _Cluster(b, tree.parent[b], len(clusters))
+                    clusters[e.boundary].nodes.append(e.name)
+                else:
+                    topLevel.append(e.name)
+
+            if self.simplified:
+                forward = (flow.pitcher.name, flow.catcher.name)
+                # If we don't have this edge, first check to see if we have it the other way
+                if forward not in edges:
+                    backward = (flow.catcher.name, flow.pitcher.name)
+                    if backward in edges:
+                        edges[backward] = "both"
+                    else:
+                        edges[forward] = "forward"
+
+        # Clusters are discovered innermost first. graphviz copies a subgraph into its parent when
+        # it is added, so a cluster only shows up inside its parent if it was discovered before it.
+        for cluster in clusters.values():
+            parent = clusters.get(cluster.parent)
+            if parent is not None and cluster.order < parent.order:
+                parent.children.append(cluster)
+
+        return topLevel, list(clusters.values()), edges
+
+    def _cluster(self, cluster: _Cluster, indent: str):
+        label = cluster.boundary.name
+        yield f"{indent}subgraph {quote(f'cluster_{label}')} {{"
+        attrs = dict(CLUSTER_ATTR, label=label)
+        yield f"{indent}\tgraph{attrList(None, attrs)}"
+        for name in cluster.nodes:
+            yield f"{indent}\t{quote(name)}"
+        for child in cluster.children:
+            yield from self._cluster(child, indent + "\t")
+        yield f"{indent}}}"
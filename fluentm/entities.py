@@ -1,12 +1,15 @@
 from __future__ import annotations
 
+from collections import namedtuple
 from enum import Flag, auto
 from types import WrapperDescriptorType
 from typing import Union
 import logging
+import threading
+import weakref
 
-from graphviz import Digraph
-from jinja2 import FileSystemLoader, Environment
+from fluentm.diagnostics import diagnostics
+from fluentm.registry import activeRegistry
 
 SPACES = "   "
 
@@ -14,10 +17,52 @@ class Unset(object):
     pass
 
 
-class Unset(object):
+class CyclicProtocolError(ValueError):
     pass
 
-class WrappableProtocol(object):
+
+# The security properties of a protocol layer. Every layer with the same properties (e.g every
+# TLS 1.2 layer) shares one immutable instance instead of carrying its own copies.
+ProtocolProperties = namedtuple(
+    "ProtocolProperties",
+    [
+        "encrypted",
+        "signed",
+        "serverAuthenticated",
+        "clientAuthenticated",
+        "serverCredential",
+        "clientCredential",
+        "version",
+    ],
+)
+_protocolProperties = {}
+
+# Every distinct protocol layer, keyed by (type, wrapped layer, properties, protocol data)
+# WeakValueDictionary.setdefault isn't atomic, new layers are added holding _protocolLock
+_protocolLayers = weakref.WeakValueDictionary()
+_protocolLock = threading.Lock()
+
+
+# Protocol layers are hash-consed: building TLS(HTTP("x")) twice gives back the same two layers.
+# Layers are shared between DataFlows so they must not be changed once built, which in turn lets
+# them remember their flattened strings and transport chain.
+class _InternedProtocol(type):
+    def __call__(cls, *args, **kwargs):
+        return super().__call__(*args, **kwargs)._intern()
+
+
+# Protocol layers are slotted, a large model holds several for every DataFlow
+class WrappableProtocol(object, metaclass=_InternedProtocol):
+    __slots__ = (
+        "wraps",
+        "protocolData",
+        "_properties",
+        "_flatString",
+        "_recordString",
+        "_chain",
+        "__weakref__",
+    )
+
     def __init__(
         self,
         toWrap: Union[Data, WrappableProtocol],
@@ -34,109 +79,159 @@ class WrappableProtocol(object):
         elif isinstance(toWrap, str):
             self.wraps = Data(toWrap)
 
-        self.encrypted = encrypted
-        self.signed = signed
-        self.serverAuthenticated = serverAuthenticated
-        self.clientAuthenticated = clientAuthenticated
-        self.serverCredential = serverCredential
-        self.clientCredential = clientCredential
-        self.version = version
-        self.protocolData = []
+        properties = ProtocolProperties(
+            encrypted,
+            signed,
+            serverAuthenticated,
+            clientAuthenticated,
+            serverCredential,
+            clientCredential,
+            version,
+        )
+        self._properties = _protocolProperties.setdefault(properties, properties)
+        self.protocolData = ()
+
+    # Returns the existing identical layer if there is one, otherwise registers this one
+    def _intern(self):
+        key = (
+            self.__class__,
+            getattr(self, "wraps", None),
+            self._properties,
+            self.protocolData,
+        )
+        existing = _protocolLayers.get(key)
+        if existing is not None:
+            return existing
+        with _protocolLock:
+            return _protocolLayers.setdefault(key, self)
+
+    # Walk from this layer inwards, returning every layer down to (but not including) the Data.
+    # Iterative so that deeply nested tunnels don't hit the recursion limit, layers are tracked
+    # by identity so that a cycle is caught in one pass.
+    def _walk(self):
+        try:
+            return self._chain
+        except AttributeError:
+            pass
+
+        layers = []
+        seen = set()
+        ptr = self
+        while isinstance(ptr, WrappableProtocol):
+            if id(ptr) in seen:
+                raise CyclicProtocolError(
+                    f"Cyclic Wrapped Data: {ptr.__class__.__name__} wraps itself"
+                )
+            seen.add(id(ptr))
+            layers.append(ptr)
+            ptr = ptr.wraps
+
+        if not isinstance(ptr, Data):
+            raise TypeError(
+                f"Bad instance type in WrappableProtocol structure: {ptr.__class__.__name__}"
+            )
+
+        self._chain = tuple(layers)
+        return self._chain
 
     def printChain(self, depth=0):
-        print(f"{SPACES * depth} {self.__class__.__name__}")
-        print(f"{SPACES*depth} Encrypted: {self.encrypted}")
-        print(f"{SPACES*depth} serverAuthenticated: {self.serverAuthenticated}")
-        print(f"{SPACES*depth} serverAuthenticated: {self.serverAuthenticated}")
-        print(f"{SPACES*depth} serverCredential: {self.serverCredential}")
-        print(f"{SPACES*depth} clientCredential: {self.clientCredential}")
-        print(f"{SPACES*depth} version: {self.version}")
-        # ...
-        print(f"{SPACES*depth} Wraps:")
-        if isinstance(self.wraps, WrappableProtocol):
-            self.wraps.printChain(depth=depth + 1)
-        else:
-            print(f"{SPACES* (depth+1)} {self.wraps}")
-
-    # Recurse and generate a single line str for the wrappable
+        for layer in self._walk():
+            print(f"{SPACES * depth} {layer.__class__.__name__}")
+            print(f"{SPACES*depth} Encrypted: {layer.encrypted}")
+            print(f"{SPACES*depth} serverAuthenticated: {layer.serverAuthenticated}")
+            print(f"{SPACES*depth} serverAuthenticated: {layer.serverAuthenticated}")
+            print(f"{SPACES*depth} serverCredential: {layer.serverCredential}")
+            print(f"{SPACES*depth} clientCredential: {layer.clientCredential}")
+            print(f"{SPACES*depth} version: {layer.version}")
+            # ...
+            print(f"{SPACES*depth} Wraps:")
+            depth += 1
+        print(f"{SPACES*depth} {self.getNestedData()}")
+
+    # Generate a single line str for the wrappable e.g "TLS( HTTP( MEEP ) )"
     def flatString(self, depth=0, s=None):
+        if s is None and depth == 0:
+            try:
+                return self._flatString
+            except AttributeError:
+                self._flatString = self.flatString(s="")
+                return self._flatString
+
         if s is None:
             s = ""
 
-        if isinstance(self, WrappableProtocol):
-            s += f"{self.__class__.__name__}( "
-            if isinstance(self.wraps, WrappableProtocol):
-                return self.wraps.flatString(depth=depth + 1, s=s)
-            if isinstance(self.wraps, Data):
-                s += f"{self.wraps.name}{' )'*(depth+1)}"
-                return s
-        else:
-            assert False, "Bad instance type in WrappableProtocol structure"
+        layers = self._walk()
+        s += "".join(f"{layer.__class__.__name__}( " for layer in layers)
+        s += f"{self.getNestedData().name}{' )'*(depth+len(layers))}"
+        return s
 
+    # The label for a graphviz record node, one field per layer e.g "TLS|HTTP|{MEEP}"
     def flatDotRecordString(self, s=None):
         # If we are at the start of the sting, we don't need a |
         if s is None:
-            s = ""
-
-        s += f"{self.__class__.__name__}"
-        if isinstance(self.version, Unset):
-            s = s + f"\n+{self.version}"
-
-        if len(self.protocolData) > 0:
-            s += "|{"
-            s += "|".join(x.__str__() for x in self.protocolData)
-            s += "}"
-
-        s += "|"
-
-        if isinstance(self.wraps, WrappableProtocol):
-            return self.wraps.flatDotRecordString(s)
-
-        if isinstance(self.wraps, Data):
-            s += "{"
-            s += f"{self.wraps.name}"
-            s += "}"
-            return s
-
-    # Recurse and provide a list of objects
+            try:
+                return self._recordString
+            except AttributeError:
+                self._recordString = self.flatDotRecordString("")
+                return self._recordString
+
+        fields = []
+        for layer in self._walk():
+            field = f"{layer.__class__.__name__}"
+            if isinstance(layer.version, Unset):
+                field = field + f"\n+{layer.version}"
+
+            if len(layer.protocolData) > 0:
+                field += "|{"
+                field += "|".join(x.__str__() for x in layer.protocolData)
+                field += "}"
+
+            fields.append(field)
+
+        s += "|".join(fields)
+        s += "|{"
+        s += f"{self.getNestedData().name}"
+        s += "}"
+        return s
+
+    # Provide a list of objects
     # Example:
     ## TLS(HTTP("MEEP"))
-    ## [TLS, HTTP, "MEEP"]
+    ## [TLS, HTTP]
     def getTransportChain(self, l=None):
         if l is None:
             l = []
+        l.extend(self._walk())
+        return l
 
-        l.append(self)
-        if isinstance(self.wraps, WrappableProtocol):
-            return self.wraps.getTransportChain(l)
-        elif isinstance(self.wraps, Data):
-            return l
-        else:
-            assert False, "Reached the unreachable"
-
+    # WrappedData objects can feasibly be cyclical, that's bad. A cycle raises CyclicProtocolError
     def getNestedData(self, visited=None):
-        if visited is None:
-            visited = []  # WrappedData objects can feasibly be cyclical, that's bad.
-
-        if self in visited:
-            assert False, "Cyclic Wrapped Data"
-        else:
-            visited.append(self)
-
-        if isinstance(self.wraps, Data):
-            return self.wraps
-        else:
-            return self.wraps.getNestedData(visited)
+        return self._walk()[-1].wraps
 
+    # Layers are shared, so this returns a new layer rather than changing this one
     def addProtocolData(self, d: Data):
-        self.protocolData.append(d)
-        return self
+        layer = object.__new__(self.__class__)
+        layer.wraps = self.wraps
+        layer._properties = self._properties
+        layer.protocolData = self.protocolData + (d,)
+        return layer._intern()
 
     def __str__(self):
         return self.flatString()
 
 
+# Read only views of the shared ProtocolProperties e.g TLS("x").encrypted
+for _field in ProtocolProperties._fields:
+    setattr(
+        WrappableProtocol,
+        _field,
+        property(lambda self, _field=_field: getattr(self._properties, _field)),
+    )
+
+
 class Plaintext(WrappableProtocol):
+    __slots__ = ()
+
     def __init__(self, toWrap):
         super().__init__(
             toWrap,
@@ -151,11 +246,15 @@ class Plaintext(WrappableProtocol):
 
 
 class DHCP(Plaintext):
+    __slots__ = ()
+
     def __init__(self, toWrap):
         super().__init__(toWrap)
 
 
 class Exec(WrappableProtocol):
+    __slots__ = ()
+
     def __init__(self, toWrap):
         super().__init__(
             toWrap,
@@ -170,6 +269,8 @@ class Exec(WrappableProtocol):
 
 
 class TCP(WrappableProtocol):
+    __slots__ = ()
+
     def __init__(self, toWrap):
         super().__init__(
             toWrap,
@@ -184,6 +285,8 @@ class TCP(WrappableProtocol):
 
 
 class TCPForwarded(WrappableProtocol):
+    __slots__ = ()
+
     def __init__(self, toWrap):
         super().__init__(
             toWrap,
@@ -198,6 +301,8 @@ class TCPForwarded(WrappableProtocol):
 
 
 class Stdout(WrappableProtocol):
+    __slots__ = ()
+
     def __init__(self, toWrap):
         super().__init__(
             toWrap,
@@ -212,6 +317,8 @@ class Stdout(WrappableProtocol):
 
 
 class Internal(WrappableProtocol):
+    __slots__ = ()
+
     def __init__(self, toWrap):
         super().__init__(
             toWrap,
@@ -226,6 +333,8 @@ class Internal(WrappableProtocol):
 
 
 class Unknown(WrappableProtocol):
+    __slots__ = ()
+
     def __init__(self, toWrap):
         super().__init__(
             toWrap,
@@ -241,6 +350,8 @@ class Unknown(WrappableProtocol):
 
 
 class JWS(WrappableProtocol):
+    __slots__ = ()
+
     def __init__(self, toWrap):
         super().__init__(
             toWrap,
@@ -256,6 +367,8 @@ class JWS(WrappableProtocol):
 
 
 class IPSEC(WrappableProtocol):
+    __slots__ = ()
+
     def __init__(self, toWrap):
         super().__init__(
             toWrap,
@@ -265,23 +378,29 @@ class IPSEC(WrappableProtocol):
             clientAuthenticated=True,
             serverCredential="x509",  # TODO: Replace with a type? Would that be useful?
             clientCredential="x509",
+            version=None,
         )
 
 
 class TLSVPN(WrappableProtocol):
+    __slots__ = ()
+
     def __init__(self, toWrap):
         super().__init__(
             toWrap,
-            encrytped=True,
+            encrypted=True,
             signed=False,
             serverAuthenticated=True,
             clientAuthenticated=False,
             serverCredential="x509",  # TODO: Replace with a type? Would that be useful?
             clientCredential=None,
+            version=None,
         )
 
 
 class MTLS(WrappableProtocol):
+    __slots__ = ()
+
     def __init__(self, toWrap):
         super().__init__(
             toWrap,
@@ -296,18 +415,24 @@ class MTLS(WrappableProtocol):
 
 
 class MTLSVPN(WrappableProtocol):
+    __slots__ = ()
+
     def __init__(self, toWrap):
         super().__init__(
             toWrap,
             encrypted=True,
+            signed=False,
             serverAuthenticated=True,
             clientAuthenticated=True,
             serverCredential="x509",
             clientCredential="x509",
+            version=None,
         )
 
 
 class SSH(WrappableProtocol):
+    __slots__ = ()
+
     def __init__(self, toWrap):
         super().__init__(
             toWrap,
@@ -322,6 +447,8 @@ class SSH(WrappableProtocol):
 
 
 class Chime(WrappableProtocol):
+    __slots__ = ()
+
     def __init__(self, toWrap):
         super().__init__(
             toWrap,
@@ -336,6 +463,8 @@ class Chime(WrappableProtocol):
 
 
 class GIT(WrappableProtocol):
+    __slots__ = ()
+
     def __init__(self, toWrap):
         super().__init__(
             toWrap,
@@ -350,6 +479,8 @@ class GIT(WrappableProtocol):
 
 
 class SQL(WrappableProtocol):
+    __slots__ = ()
+
     def __init__(self, toWrap, version="0"):
         super().__init__(
             toWrap,
@@ -364,20 +495,8 @@ class SQL(WrappableProtocol):
 
 
 class TLS(WrappableProtocol):
-    def __init__(self, toWrap, version="1.2"):
-        super().__init__(
-            toWrap,
-            encrypted=True,
-            signed=False,
-            serverAuthenticated=True,
-            clientAuthenticated=False,
-            serverCredential="x509",
-            clientCredential=None,
-            version=version,
-        )
-
+    __slots__ = ()
 
-class TLS(WrappableProtocol):
     def __init__(self, toWrap, version="1.2"):
         super().__init__(
             toWrap,
@@ -392,6 +511,8 @@ class TLS(WrappableProtocol):
 
 
 class SIGV4(WrappableProtocol):
+    __slots__ = ()
+
     def __init__(self, toWrap):
         super().__init__(
             toWrap,
@@ -406,6 +527,8 @@ class SIGV4(WrappableProtocol):
 
 
 class HTTPBasicAuth(WrappableProtocol):
+    __slots__ = ()
+
     def __init__(self, toWrap, version="2.0"):
         super().__init__(
             toWrap,
@@ -420,6 +543,8 @@ class HTTPBasicAuth(WrappableProtocol):
 
 
 class HTTP(WrappableProtocol):
+    __slots__ = ()
+
     def __init__(self, toWrap, version="2.0"):
         super().__init__(
             toWrap,
@@ -433,42 +558,53 @@ class HTTP(WrappableProtocol):
         )
 
 
-# Implements Borg pattern for each unique asset
+# Each unique asset (by type and name) exists once in the active Registry, asking for it again
+# e.g Boundary("Internet") returns the object that was interned the first time.
 class Asset(object):
-    _instances = {}
+    def __new__(cls, name, *args, **kwargs):
+        registry = activeRegistry()
+        existing = registry.intern(cls, name)
+        if existing is not None:
+            return existing
+
+        # If another thread interned the same asset first, that is the one returned
+        self = super().__new__(cls)
+        self.name = name
+        self._registry = registry
+        return registry.add(self)
 
+    # Everything is set up by __new__ so that a repeat lookup leaves the existing asset untouched
     def __init__(self, name):
-        self.name = name
+        pass
 
-        if self.__class__.__name__ in Asset._instances:  # e.g Boundary
-            if (
-                self.name in Asset._instances[self.__class__.__name__]
-            ):  # eg Boundary.name == "Internet"
-                self.__dict__ = Asset._instances[self.__class__.__name__][
-                    self.name
-                ].__dict__  # Make both Boundary objects of "internet" have the same dict
-            else:
-                Asset._instances[self.__class__.__name__][self.name] = self
-        else:
-            Asset._instances[self.__class__.__name__] = {self.name: self}
+    # Unpickling interns into the active registry
+    def __getnewargs__(self):
+        return (self.name,)
+
+    def __getstate__(self):
+        return {k: v for k, v in self.__dict__.items() if k != "_registry"}
 
     # Magic str/object function
+    # Changes to an asset are made holding its registry's lock, see Registry
     def inBoundary(self, boundary: Union[Boundary, str]):
-        if isinstance(boundary, Boundary):
+        if isinstance(boundary, str):
+            boundary = Boundary(boundary)
+        assert isinstance(boundary, Boundary), "Bad type to inBoundary"
+
+        with self._registry.lock:
+            old = getattr(self, "boundary", None)
             self.boundary = boundary
-        elif isinstance(boundary, str):
-            self.boundary = Boundary(boundary)
-        else:
-            assert False, "Bad type to inBoundary"
+            self._registry.placed(self, old, self.boundary)
         return self
 
     def addCredential(self, credential):
         assert isinstance(credential, Credential)
-        if hasattr(self, "credentials"):
-            assert isinstance(self.credentials, list)
-            self.credentials.append(credential)
-        else:
-            self.credentials = [credential]
+        with self._registry.lock:
+            if hasattr(self, "credentials"):
+                assert isinstance(self.credentials, list)
+                self.credentials.append(credential)
+            else:
+                self.credentials = [credential]
         return self
 
     # Magic str/object function
@@ -482,31 +618,23 @@ class Asset(object):
         else:
             assert "processesData called without a data object or a string key to a data object"
 
-        if hasattr(self, "processedData"):
-            self.processedData.append(theData)
-        else:
-            self.processedData = [theData]
+        with self._registry.lock:
+            if hasattr(self, "processedData"):
+                self.processedData.append(theData)
+            else:
+                self.processedData = [theData]
         return self
 
     # static / non-instantiated i.e no 'self'
     def get(className, instanceName):
-        assert className in Asset._instances
-
-        if instanceName in Asset._instances[className]:
-            return Asset._instances[className][instanceName]
-        else:
-            # TODO: Think about what exception to throw here
-            assert False, f"Unable to find {className} of type {instanceName}"
-            return None
+        return activeRegistry().get(className, instanceName)
 
     def __repr__(self):
         return f"{self.__class__.__name__}:{self.name}"
 
 
 class Boundary(Asset):
-    def __init__(self, name):
-        super().__init__(name)
-        self.shape = "Dotted Box"
+    shape = "Dotted Box"
 
     def get(name):
         return Asset.get("Boundary", name)
@@ -531,9 +659,7 @@ class Classification(Flag):
 
 
 class Credential(Asset):
-    def __init__(self, name):
-        super().__init__(name)
-        self.shape = "Key"
+    shape = "Key"
 
     def isPrimaryFactor(self):
         self.primaryFactor = True
@@ -569,21 +695,19 @@ class Credential(Asset):
 
 
 class Container(Asset):
-    def __init__(self, name):
-        super().__init__(name)
-        self.shape = "Circle"
+    shape = "Circle"
 
 
 class Data(Asset):
-    def __init__(self, name):
-        super().__init__(name)
-        self.shape = "Data"
-        self.classified = Unset()
-        self.encryptedAtRest = Unset()
+    shape = "Data"
+    classification = Unset()
+    encryptedAtRest = Unset()
 
     def classified(self, classification):
         assert isinstance(classification, Classification)
-        self.classification = classification
+        with self._registry.lock:
+            self._registry.classified(self, self.classification, classification)
+            self.classification = classification
         return self
 
     def isEncryptedAtRest(self):
@@ -598,25 +722,32 @@ class Data(Asset):
 
 
 class Actor(Asset):
-    def __init__(self, name):
-        super().__init__(name)
-        self.shape = "Man"
+    shape = "Man"
 
     def get(name):
         return Asset.get("Actor", name)
 
 
 class Process(Asset):
-    def __init__(self, name):
-        super().__init__(name)
-        self.shape = "Square"
+    shape = "Square"
 
     def get(name):
         return Asset.get("Process", name)
 
 
 # DataFlow is _NOT_ an Asset
+# Slotted like WrappableProtocol. response is only assigned when there is one, so
+# hasattr(flow, "response") works as it always has without storing a None per flow.
 class DataFlow(object):
+    __slots__ = (
+        "pitcher",
+        "catcher",
+        "name",
+        "wrappedData",
+        "response",
+        "_responseFlow",
+    )
+
     def __init__(
         self,
         pitcher: Union[Actor, Process],
@@ -633,15 +764,14 @@ class DataFlow(object):
             catcher, (Actor, Process)
         ), f"catcher is incorrect type: {catcher.__class__.__name__}"  # Check catcher is a type that can receive a dataflow
 
+        # Counted against the line that built the flow, see fluentm.diagnostics
         if isinstance(data, str):
-            logging.warning(
-                f"DataFlow using 'string' for data. Assuming plaintext wrapping. See https://github.com/hyakuhei/fluentm/blob/main/help.md"
-            )
+            if diagnostics.enabled:
+                diagnostics.record("string-data")
             wrappedData = Plaintext(Data(data))
         elif isinstance(data, Data):
-            logging.warning(
-                f"DataFlow using 'Data'. Assuming plaintext wrapping. See https://github.com/hyakuhei/fluentm/blob/main/help.md"
-            )
+            if diagnostics.enabled:
+                diagnostics.record("data-data")
             wrappedData = Plaintext(data)
         elif isinstance(data, WrappableProtocol):
             wrappedData = data
@@ -664,6 +794,29 @@ class DataFlow(object):
         self.name = name
         self.wrappedData = wrappedData
 
+    # The response as a DataFlow of its own from catcher back to pitcher, built once and reused.
+    # A str or Data response is wrapped in Plaintext, as DataFlow would, without a warning.
+    def responseFlow(self):
+        try:
+            return self._responseFlow
+        except AttributeError:
+            pass
+
+        response = self.response
+        if isinstance(response, str):
+            response = Plaintext(Data(response))
+        elif isinstance(response, Data):
+            response = Plaintext(response)
+        self._responseFlow = DataFlow(self.catcher, self.pitcher, response)
+        return self._responseFlow
+
     def __repr__(self):
         return f"{self.__class__.__name__}:{self.name}"
 
+
+# Every flow followed by its response, if it has one
+def expandResponses(flows):
+    for flow in flows:
+        yield flow
+        if hasattr(flow, "response"):
+            yield flow.responseFlow()
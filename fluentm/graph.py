@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+from collections import deque
+
+from fluentm.entities import Boundary, Data, expandResponses
+
+
+# Every DataFlow in a set of scenes as a directed graph of entities, built in one pass.
+#   g = FlowGraph(scenes)
+#   g.reachable(Boundary.get("Internet"))           every entity the Internet can reach
+#   g.shortestPath(Actor.get("Customer"), Process.get("Content DB"))
+#   g.paths(Boundary.get("Internet"), Process.get("Content DB"))
+#   g.lineage(Data.get("Password"))
+# Entities are numbered and kept in adjacency lists of numbers, a flow that appears in several
+# scenes is only one edge. The response to a flow is an edge of its own back from the catcher, as
+# in the aggregated DFD. Wherever an entity is expected a Boundary (meaning every entity nested
+# in it) or a list of entities can be given instead.
+class FlowGraph(object):
+    def __init__(self, scenes: dict):
+        self.entities = []  # Node number -> entity
+        self.number = {}  # Entity -> node number
+        self.targets = []  # Node number -> [node number] along outgoing flows
+        self.outgoing = []  # Node number -> [DataFlow], in step with targets
+        self.sources = []  # Node number -> [node number] along incoming flows
+        self.incoming = []
+        self.carrying = {}  # Data -> [DataFlow]
+
+        seen = set()
+        for flows in scenes.values():
+            for flow in expandResponses(flows):
+                if id(flow) in seen:
+                    continue
+                seen.add(id(flow))
+
+                p = self._node(flow.pitcher)
+                c = self._node(flow.catcher)
+                self.targets[p].append(c)
+                self.outgoing[p].append(flow)
+                self.sources[c].append(p)
+                self.incoming[c].append(flow)
+                data = flow.wrappedData.getNestedData()
+                self.carrying.setdefault(data, []).append(flow)
+
+    def _node(self, entity):
+        n = self.number.get(entity)
+        if n is None:
+            n = self.number[entity] = len(self.entities)
+            self.entities.append(entity)
+            self.targets.append([])
+            self.outgoing.append([])
+            self.sources.append([])
+            self.incoming.append([])
+        return n
+
+    # Node numbers for an entity, a Boundary or a list of either
+    def _nodes(self, what):
+        if isinstance(what, Boundary):
+            tree = what._registry.boundaryTree()
+            what = tree.entitiesUnder(what)
+        elif not isinstance(what, (list, tuple, set)):
+            what = [what]
+
+        nodes = []
+        for e in what:
+            if isinstance(e, Boundary):
+                nodes.extend(self._nodes(e))
+            elif e in self.number:
+                nodes.append(self.number[e])
+        return nodes
+
+    def successors(self, entity):
+        return [self.entities[n] for n in self.targets[self.number[entity]]]
+
+    def predecessors(self, entity):
+        return [self.entities[n] for n in self.sources[self.number[entity]]]
+
+    def _bfs(self, starts, adjacency):
+        visited = bytearray(len(self.entities))
+        queue = deque()
+        for n in starts:
+            if not visited[n]:
+                visited[n] = 1
+                queue.append(n)
+
+        order = []
+        while queue:
+            n = queue.popleft()
+            order.append(n)
+            for m in adjacency[n]:
+                if not visited[m]:
+                    visited[m] = 1
+                    queue.append(m)
+        return order
+
+    # Every entity that can be reached from source by following flows, nearest first.
+    # reverse=True follows flows backwards, giving every entity that can reach source.
+    # The starting entities are only included if a flow leads back to them.
+    def reachable(self, source, reverse=False):
+        starts = self._nodes(source)
+        adjacency = self.sources if reverse else self.targets
+        # Start from the neighbours so that a start only appears if it's reached again
+        neighbours = [m for n in starts for m in adjacency[n]]
+        return [self.entities[n] for n in self._bfs(neighbours, adjacency)]
+
+    def canReach(self, source, target):
+        targets = set(self._nodes(target))
+        starts = self._nodes(source)
+        return any(n in targets for n in self._bfs(starts, self.targets))
+
+    # The fewest flows that get from source to target, None if target can't be reached
+    def shortestPath(self, source, target):
+        isTarget = bytearray(len(self.entities))
+        for n in self._nodes(target):
+            isTarget[n] = 1
+
+        via = [None] * len(self.entities)  # Node number -> (previous node number, flow)
+        visited = bytearray(len(self.entities))
+        queue = deque()
+        for n in self._nodes(source):
+            if isTarget[n]:
+                return []
+            visited[n] = 1
+            queue.append(n)
+
+        while queue:
+            n = queue.popleft()
+            targets, outgoing = self.targets[n], self.outgoing[n]
+            for i, m in enumerate(targets):
+                if visited[m]:
+                    continue
+                visited[m] = 1
+                via[m] = (n, outgoing[i])
+                if isTarget[m]:
+                    path = []
+                    while via[m] is not None:
+                        m, flow = via[m]
+                        path.append(flow)
+                    return path[::-1]
+                queue.append(m)
+        return None
+
+    # Every path of flows from source to target that doesn't visit an entity twice. There can be
+    # very many in a dense model, so they're generated one at a time, depth first.
+    def paths(self, source, target, maxLength=None):
+        targets = set(self._nodes(target))
+        for start in self._nodes(source):
+            onPath = {start}
+            path = []
+            stack = [iter(zip(self.targets[start], self.outgoing[start]))]
+            while stack:
+                step = next(stack[-1], None)
+                if step is None:
+                    stack.pop()
+                    if path:
+                        onPath.discard(path.pop()[0])
+                    continue
+
+                m, flow = step
+                if m in onPath:
+                    continue
+                if m in targets:
+                    yield [f for _, f in path] + [flow]
+                    continue
+                if maxLength is not None and len(path) + 1 >= maxLength:
+                    continue
+                onPath.add(m)
+                path.append((m, flow))
+                stack.append(iter(zip(self.targets[m], self.outgoing[m])))
+
+    # The flows that carry data directly
+    def flowsCarrying(self, data: Data):
+        return list(self.carrying.get(data, []))
+
+    # Every entity data can end up at: the catchers of the flows that carry it and, transitively,
+    # every entity those can pass anything on to. transitive=False gives only the catchers.
+    def lineage(self, data: Data, transitive=True):
+        catchers = dict.fromkeys(
+            self.number[flow.catcher] for flow in self.carrying.get(data, [])
+        )
+        nodes = self._bfs(catchers, self.targets) if transitive else catchers
+        return [self.entities[n] for n in nodes]
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+from collections import namedtuple
+
+from fluentm.entities import Classification, Unknown, expandResponses
+
+# A rule that matched, subject is the DataFlow or Data it matched and scenes where it appears
+Finding = namedtuple("Finding", ["code", "severity", "message", "subject", "scenes"])
+
+
+# Everything rules select from, built in a single pass over the model:
+#   flows             every flow
+#   crossing          flows whose pitcher and catcher are in different boundaries
+#   byProtocol        flows by the class of every layer in their transport chain
+#   byClassification  data carried by a flow or processed by an entity, by classification
+# Each index maps its subjects to the list of scenes they appear in, so a finding needs no lookup.
+# The response to a flow is linted as a flow of its own, back from the catcher.
+class LintIndex(object):
+    def __init__(self, scenes: dict):
+        self.flows = {}
+        self.crossing = {}
+        self.byProtocol = {}
+        self.byClassification = {}
+        self.dataScenes = {}
+
+        for key, flows in scenes.items():
+            for flow in expandResponses(flows):
+                if flow in self.flows:
+                    self.flows[flow].append(key)
+                    continue
+                flowScenes = self.flows[flow] = [key]
+
+                if flow.pitcher._registry.crossing(flow).crosses:
+                    self.crossing[flow] = flowScenes
+
+                for layer in flow.wrappedData._walk():
+                    self.byProtocol.setdefault(layer.__class__, {})[flow] = flowScenes
+
+                self._data(flow.wrappedData.getNestedData(), key)
+                for entity in (flow.pitcher, flow.catcher):
+                    for data in getattr(entity, "processedData", []):
+                        self._data(data, key)
+
+    def _data(self, data, scene):
+        scenes = self.dataScenes.setdefault(data, [])
+        if scene not in scenes:
+            scenes.append(scene)
+        self.byClassification.setdefault(data.classification, {})[data] = scenes
+
+    # The subjects a rule is evaluated against, see Rule
+    def select(self, over: str, key=None):
+        if over == "flows":
+            return self.flows
+        if over == "crossing":
+            return self.crossing
+        if over == "protocol":
+            return self.byProtocol.get(key, {})
+        if over == "classification":
+            # Classification is a Flag, so key can be several e.g SECRET | TOPSECRET
+            found = {}
+            for classification, data in self.byClassification.items():
+                if isinstance(classification, Classification) and classification & key:
+                    found.update(data)
+            return found
+        assert False, f"Unknown index {over}"
+
+
+# A lint rule picks its subjects out of one of the LintIndex indexes rather than scanning every
+# flow, check is then only called on those. A rule without a check matches everything selected.
+#   Rule("no-ssh", "SSH in use", over="protocol", key=SSH)
+#   Rule("unsigned", "Unsigned flow", over="flows", check=lambda f: not f.wrappedData.signed)
+class Rule(object):
+    def __init__(
+        self,
+        code: str,
+        message: str,
+        over="flows",
+        key=None,
+        check=None,
+        severity="warning",
+    ):
+        self.code = code
+        self.message = message
+        self.over = over
+        self.key = key
+        self.check = check
+        self.severity = severity
+
+    def evaluate(self, index: LintIndex):
+        subjects = index.select(self.over, self.key).items()
+        if self.check is not None:
+            check = self.check
+            subjects = [(s, scenes) for s, scenes in subjects if check(s)]
+
+        code, severity, message = self.code, self.severity, self.message
+        return [Finding(code, severity, message, s, scenes) for s, scenes in subjects]
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}:{self.code}"
+
+
+def _plaintext(flow):
+    return not any(layer.encrypted is True for layer in flow.wrappedData._walk())
+
+
+def _notEncryptedAtRest(data):
+    return data.encryptedAtRest is not True
+
+
+DEFAULT_RULES = [
+    Rule(
+        "plaintext-crossing",
+        "Data crosses a boundary without an encrypted transport",
+        over="crossing",
+        check=_plaintext,
+    ),
+    Rule(
+        "unknown-transport",
+        "Flow uses an Unknown transport",
+        over="protocol",
+        key=Unknown,
+    ),
+    Rule(
+        "unencrypted-secret",
+        "SECRET data is not encrypted at rest",
+        over="classification",
+        key=Classification.SECRET | Classification.TOPSECRET,
+        check=_notEncryptedAtRest,
+        severity="error",
+    ),
+]
+
+
+# Every finding for every rule, the index is built once and shared by all of them
+#   for finding in lint(scenes):
+#       print(finding.code, finding.subject, finding.scenes)
+def lint(scenes: dict, rules=None):
+    index = LintIndex(scenes)
+    findings = []
+    for rule in DEFAULT_RULES if rules is None else rules:
+        findings.extend(rule.evaluate(index))
+    return findings
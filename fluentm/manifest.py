@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+
+from fluentm.entities import WrappableProtocol
+
+MANIFEST_FILE = ".fluentm-manifest.json"
+MANIFEST_VERSION = 1
+
+
+# The boundary chain of an entity, innermost first e.g "Process:Web Server<Front End<BookStore"
+def _entityFingerprint(entity):
+    s = f"{entity.__class__.__name__}:{entity.name}"
+    ptr = entity
+    while hasattr(ptr, "boundary"):
+        ptr = ptr.boundary
+        s += f"<{ptr.name}"
+    return s
+
+
+# The record string leaves out e.g a layer's version, which SVG records show, so the properties
+# of every layer go in too
+def _layerFingerprint(layer):
+    if not isinstance(layer, WrappableProtocol):
+        return str(layer)
+    properties = ";".join(repr(l._properties) for l in layer._walk())
+    return f"{layer.flatDotRecordString()}|{properties}"
+
+
+def _flowFingerprint(flow):
+    s = f"{_entityFingerprint(flow.pitcher)}>{_entityFingerprint(flow.catcher)}"
+    s += f"|{flow.name}|{_layerFingerprint(flow.wrappedData)}"
+    if hasattr(flow, "response"):
+        s += f"|{_layerFingerprint(flow.response)}"
+    return s
+
+
+# Fingerprint everything that ends up in a scene's diagrams: every flow, the entities it
+# touches and their boundaries. Any report option that changes the output goes in options.
+def sceneFingerprint(flows: list, **options):
+    digest = hashlib.sha256(json.dumps(options, sort_keys=True).encode("utf-8"))
+    for flow in flows:
+        digest.update(_flowFingerprint(flow).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+# The aggregated DFD depends on every scene
+def aggregateFingerprint(fingerprints: dict):
+    digest = hashlib.sha256()
+    for key in sorted(fingerprints):
+        digest.update(f"{key}\0{fingerprints[key]}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+# Records the fingerprint of every scene rendered into an output directory so that the
+# next report() only re-renders the scenes that changed since.
+class Manifest(object):
+    def __init__(self, outputDir: str, scenes=None, aggregate=None):
+        self.outputDir = outputDir
+        self.scenes = scenes if scenes is not None else {}
+        self.aggregate = aggregate
+
+    @property
+    def path(self):
+        return os.path.join(self.outputDir, MANIFEST_FILE)
+
+    # A missing, unreadable or outdated manifest behaves like an empty one: everything changed
+    def load(outputDir: str):
+        try:
+            with open(os.path.join(outputDir, MANIFEST_FILE)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return Manifest(outputDir)
+
+        if data.get("version") != MANIFEST_VERSION:
+            return Manifest(outputDir)
+        return Manifest(outputDir, data.get("scenes", {}), data.get("aggregate"))
+
+    def sceneChanged(self, key: str, fingerprint: str):
+        return self.scenes.get(key) != fingerprint
+
+    def aggregateChanged(self, fingerprint: str):
+        return self.aggregate != fingerprint
+
+    def save(self):
+        os.makedirs(self.outputDir or ".", exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump(
+                {
+                    "version": MANIFEST_VERSION,
+                    "scenes": self.scenes,
+                    "aggregate": self.aggregate,
+                },
+                f,
+                indent=1,
+                sort_keys=True,
+            )
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import os
+import runpy
+
+from fluentm.registry import Registry
+
+
+# A threat model: its scenes and a Registry of its own, so that several models can be built and
+# rendered in one process without sharing assets. Inside the with block assets are created in,
+# and Actor.get/Process.get etc. resolve against, this model.
+#   with Model("bookstore") as m:
+#       m.scenes["Login"] = [DataFlow(Actor("Customer"), Process("Nginx"), HTTP("GET /"))]
+#       Process.get("Nginx")
+#   m.report("bookstore")
+# Models are independent of each other per thread as well, as each thread has its own context.
+class Model(object):
+    def __init__(self, name: str, scenes: dict = None):
+        self.name = name
+        self.registry = Registry(name)
+        self.scenes = {} if scenes is None else scenes
+
+    # Runs a python file that defines scenes as a Model. It isn't run as __main__, so the usual
+    # `if __name__ == "__main__": report(...)` block is skipped.
+    def load(path: str, name: str = None):
+        model = Model(name or os.path.splitext(os.path.basename(path))[0])
+        with model:
+            namespace = runpy.run_path(path, run_name="fluentm_model")
+        assert "scenes" in namespace, f"{path} doesn't define scenes"
+        model.scenes = namespace["scenes"]
+        return model
+
+    def get(self, className: str, instanceName: str):
+        return self.registry.get(className, instanceName)
+
+    # See fluentm.renderer.report
+    def report(self, outputDir: str, **options):
+        from fluentm.renderer import report
+
+        with self:
+            return report(self.scenes, outputDir, **options)
+
+    # See fluentm.linter.lint
+    def lint(self, rules=None):
+        from fluentm.linter import lint
+
+        with self:
+            return lint(self.scenes, rules)
+
+    # See fluentm.graph.FlowGraph
+    def graph(self):
+        from fluentm.graph import FlowGraph
+
+        with self:
+            return FlowGraph(self.scenes)
+
+    def __enter__(self):
+        self.registry.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.__exit__(*exc)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}:{self.name}"
@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+from collections import namedtuple
+from contextvars import ContextVar
+import threading
+
+
+# Interns every Asset by type and name, so that Process("Web Server") always refers to the
+# same object, and keeps secondary indexes over the model as it is built:
+#  - entities by the boundary they were placed in
+#  - boundaries by their parent boundary (None for the outermost boundaries)
+#  - data by classification
+#  - assets of any type by name
+#  - the boundaries every DataFlow crosses, see CrossingIndex
+#
+# The active registry is held in a context variable. Use a Registry as a context manager to
+# build a model in isolation, everything created inside the with block is interned there and
+# can be dropped with it.
+#   with Registry() as r:
+#       Process("Web Server").inBoundary("DMZ")
+#       r.entitiesIn(Boundary.get("DMZ"))
+#
+# A registry can be built from several threads at once. Looking up an existing asset takes no
+# lock, interning a new one and every change to the indexes or to an asset (inBoundary etc.) is
+# made while holding lock, so two threads can't both create Boundary("VPC").
+class Registry(object):
+    def __init__(self, name: str = "default"):
+        self.name = name
+        self.lock = threading.RLock()
+        self._local = threading.local()  # Tokens of each thread that enters the registry
+        self.reset()
+
+    def reset(self):
+        self._instances = {}  # e.g {"Boundary": {"Internet": Boundary:Internet}}
+        self._byName = {}
+        self._byBoundary = {}
+        self._boundariesByParent = {}
+        self._dataByClassification = {}
+        self._tree = None
+        self.version = 0  # Bumped on every change to the boundary structure
+        self.crossings = CrossingIndex(self)
+
+    # Returns the existing asset of this type and name, or None
+    def intern(self, cls: type, name: str):
+        return self._instances.get(cls.__name__, {}).get(name)
+
+    # Interns asset and returns it, unless another thread interned one of the same type and name
+    # first, in which case that one is returned instead
+    def add(self, asset):
+        className = asset.__class__.__name__
+        with self.lock:
+            instances = self._instances.setdefault(className, {})
+            if asset.name in instances:
+                return instances[asset.name]
+            instances[asset.name] = asset
+            self._byName.setdefault(asset.name, []).append(asset)
+            if className == "Boundary":
+                self._boundariesByParent.setdefault(None, {})[asset] = None
+                self.version += 1
+        return asset
+
+    def get(self, className: str, instanceName: str):
+        assert className in self._instances, f"No assets of type {className}"
+
+        if instanceName in self._instances[className]:
+            return self._instances[className][instanceName]
+        else:
+            # TODO: Think about what exception to throw here
+            assert False, f"Unable to find {className} of type {instanceName}"
+            return None
+
+    # Every asset of a type, or of every type
+    def assets(self, className: str = None):
+        with self.lock:
+            if className is not None:
+                return list(self._instances.get(className, {}).values())
+            return [
+                a for instances in self._instances.values() for a in instances.values()
+            ]
+
+    # Cross-type lookup, e.g an Actor and a Boundary both called "Internet"
+    def lookup(self, name: str):
+        with self.lock:
+            return list(self._byName.get(name, []))
+
+    # Called by Asset.inBoundary when an asset moves from one boundary to another
+    def placed(self, asset, old, new):
+        with self.lock:
+            if asset.__class__.__name__ == "Boundary":
+                index = self._boundariesByParent
+                self.version += 1
+            else:
+                index = self._byBoundary
+
+            if old in index:
+                index[old].pop(asset, None)
+            index.setdefault(new, {})[asset] = None
+            self.crossings.moved(asset)
+
+    # Called by Data.classified
+    def classified(self, data, old, new):
+        with self.lock:
+            if old in self._dataByClassification:
+                self._dataByClassification[old].pop(data, None)
+            self._dataByClassification.setdefault(new, {})[data] = None
+
+    # Entities placed directly in boundary (not in boundaries nested inside it)
+    def entitiesIn(self, boundary):
+        with self.lock:
+            return list(self._byBoundary.get(boundary, {}))
+
+    # Boundaries nested directly in parent, parent=None gives the outermost boundaries
+    def childBoundaries(self, parent=None):
+        with self.lock:
+            return list(self._boundariesByParent.get(parent, {}))
+
+    def classifiedAs(self, classification):
+        with self.lock:
+            return list(self._dataByClassification.get(classification, {}))
+
+    # The boundaries a DataFlow exits and enters, see CrossingIndex
+    def crossing(self, flow):
+        with self.lock:
+            return self.crossings.get(flow)
+
+    # The nesting of every boundary, rebuilt only when boundaries have changed since the last call
+    def boundaryTree(self):
+        with self.lock:
+            if self._tree is None or self._tree.version != self.version:
+                self._tree = BoundaryTree(self)
+            return self._tree
+
+    def __contains__(self, asset):
+        return self.intern(asset.__class__, asset.name) is asset
+
+    def __len__(self):
+        return sum(len(instances) for instances in self._instances.values())
+
+    def __enter__(self):
+        if not hasattr(self._local, "tokens"):
+            self._local.tokens = []
+        self._local.tokens.append(_active.set(self))
+        return self
+
+    def __exit__(self, *exc):
+        _active.reset(self._local.tokens.pop())
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}:{self.name}"
+
+
+# How the boundaries of a registry nest, built in one pass from its indexes.
+#   tree = registry.boundaryTree()
+#   tree.parent[b], tree.depth[b], tree.chain(b), tree.descendants(b), tree.entitiesUnder(b)
+# Outermost boundaries have a parent of None and a depth of 0.
+class BoundaryTree(object):
+    def __init__(self, registry: Registry):
+        self.registry = registry
+        self.version = registry.version
+        self.parent = {}
+        self.depth = {}
+        self.children = {}
+        self._chains = {}
+        self._crossings = {}
+
+        # Breadth first from the outermost boundaries, so every parent is placed before its children
+        level = registry.childBoundaries(None)
+        for b in level:
+            self.parent[b] = None
+        depth = 0
+        while level:
+            nextLevel = []
+            for b in level:
+                self.depth[b] = depth
+                self.children[b] = registry.childBoundaries(b)
+                for child in self.children[b]:
+                    self.parent[child] = b
+                nextLevel.extend(self.children[b])
+            level = nextLevel
+            depth += 1
+
+        # Anything not reached from the outermost boundaries is nested inside itself
+        unreached = [b for b in registry.assets("Boundary") if b not in self.depth]
+        assert not unreached, f"Cyclic boundary nesting: {unreached}"
+
+    # The boundary followed by each boundary it is nested in, outermost last
+    def chain(self, boundary):
+        missing = []
+        ptr = boundary
+        while ptr is not None and ptr not in self._chains:
+            missing.append(ptr)
+            ptr = self.parent[ptr]
+
+        chain = self._chains[ptr] if ptr is not None else ()
+        for b in reversed(missing):
+            chain = (b,) + chain
+            self._chains[b] = chain
+        return self._chains[boundary]
+
+    # The innermost boundary that both a and b are nested in (or are), None if there isn't one.
+    # None as a or b is outside every boundary.
+    def lca(self, a, b):
+        if a is None or b is None:
+            return None
+        while self.depth[a] > self.depth[b]:
+            a = self.parent[a]
+        while self.depth[b] > self.depth[a]:
+            b = self.parent[b]
+        while a is not b:
+            a, b = self.parent[a], self.parent[b]
+        return a
+
+    # Going from an entity in boundary a to one in boundary b, the boundaries that are exited
+    # (innermost first) and then entered (outermost first). Memoized per pair of boundaries.
+    def crossing(self, a, b):
+        key = (a, b)
+        if key not in self._crossings:
+            common = self.lca(a, b)
+            exited = self.chain(a) if a is not None else ()
+            entered = self.chain(b) if b is not None else ()
+            if common is not None:
+                exited = exited[: exited.index(common)]
+                entered = entered[: entered.index(common)]
+            self._crossings[key] = Crossing(exited, entered[::-1])
+        return self._crossings[key]
+
+    # Every boundary nested inside boundary, at any depth
+    def descendants(self, boundary):
+        found = []
+        stack = list(reversed(self.children.get(boundary, [])))
+        while stack:
+            b = stack.pop()
+            found.append(b)
+            stack.extend(reversed(self.children.get(b, [])))
+        return found
+
+    # Every entity placed in boundary or in any boundary nested inside it
+    def entitiesUnder(self, boundary):
+        entities = self.registry.entitiesIn(boundary)
+        for b in self.descendants(boundary):
+            entities.extend(self.registry.entitiesIn(b))
+        return entities
+
+
+class Crossing(namedtuple("Crossing", ["exited", "entered"])):
+    __slots__ = ()
+
+    @property
+    def crosses(self):
+        return bool(self.exited or self.entered)
+
+    # Every boundary crossed, in the order they're crossed
+    @property
+    def boundaries(self):
+        return self.exited + self.entered
+
+
+# The Crossing of every DataFlow that has been asked about, computed once and shared by the
+# linter, renderer and reports:
+#   registry.crossing(flow).exited / .entered / .crosses
+# Crossings come from lowest common ancestor queries on the BoundaryTree. When an entity is
+# moved with inBoundary() only the flows that touch it are recomputed. When a boundary is moved,
+# only the flows touching entities nested inside it are.
+class CrossingIndex(object):
+    def __init__(self, registry: Registry):
+        self.registry = registry
+        self._crossings = {}  # DataFlow -> Crossing
+        self._flowsByEntity = {}
+        self._dirty = {}  # Assets moved since their flows' crossings were computed
+
+    def get(self, flow):
+        if self._dirty:
+            self._refresh()
+        if flow not in self._crossings:
+            for e in (flow.pitcher, flow.catcher):
+                self._flowsByEntity.setdefault(e, {})[flow] = None
+            self._crossings[flow] = self._compute(flow)
+        return self._crossings[flow]
+
+    def moved(self, asset):
+        if self._crossings:
+            self._dirty[asset] = None
+
+    def _compute(self, flow):
+        tree = self.registry.boundaryTree()
+        return tree.crossing(
+            getattr(flow.pitcher, "boundary", None),
+            getattr(flow.catcher, "boundary", None),
+        )
+
+    def _refresh(self):
+        tree = self.registry.boundaryTree()
+        entities = {}
+        for asset in self._dirty:
+            if asset.__class__.__name__ == "Boundary":
+                entities.update(dict.fromkeys(tree.entitiesUnder(asset)))
+            else:
+                entities[asset] = None
+        self._dirty = {}
+
+        for e in entities:
+            for flow in self._flowsByEntity.get(e, {}):
+                self._crossings[flow] = self._compute(flow)
+
+
+# Used whenever no other registry has been activated
+defaultRegistry = Registry()
+
+_active = ContextVar("fluentm_registry", default=defaultRegistry)
+
+
+def activeRegistry():
+    return _active.get()
@@ -1,115 +1,93 @@
 from __future__ import annotations
-from importlib import resources
+from typing import TYPE_CHECKING
+import itertools
+import logging
+import os
+
+from fluentm.entities import Unset, expandResponses
+from fluentm.cache import RenderCache
+from fluentm.diagnostics import diagnostics
+from fluentm.dot import DfdWriter
+from fluentm.manifest import Manifest, aggregateFingerprint, sceneFingerprint
+from fluentm.scheduler import RenderJob, RenderScheduler
+
+# graphviz and jinja2 are imported where they're first needed, so that importing the renderer
+# (e.g to build a model or lint it) doesn't pay for them
+if TYPE_CHECKING:
+    from graphviz import Digraph
 
-from graphviz import Digraph
-from jinja2 import PackageLoader, Environment
+SPACES = "   "
 
-from fluentm.entities import (
-    Boundary,
-    DataFlow
-)
+FORMATS = ("png", "svg", "none")
+
+
+# If a scheduler is provided the render is queued on it, otherwise it happens immediately
+def _render(job: RenderJob, scheduler=None):
+    if scheduler is not None:
+        return scheduler.submit(job)
+    return job.run()
 
-SPACES = "   "
 
-def renderDfd(graph: Digraph, title: str, outputDir: str):
-    graph.render(f"{outputDir}/{title}-dfd", format="png", view=False)
-    # print(graph)
-    return f"{title}-dfd.png"
+# format is "png", "svg" or "none" to skip rendering altogether, in which case None is returned
+def renderDfd(graph: Digraph, title: str, outputDir: str, scheduler=None, format="png"):
+    assert format in FORMATS, f"Unknown format: {format}"
+    if format == "none":
+        return None
+    job = RenderJob(graph, f"{title}-dfd", directory=outputDir, format=format)
+    return _render(job, scheduler)
 
 
 def dfd(scenes: dict, title: str, dfdLabels=True, render=False, simplified=False):
-    graph = Digraph(title)
-    graph.attr(rankdir="LR", color="blue", fontname="Arial")
-    graph.attr(
-        "node",
-        fontname="Arial",
-        fontsize="11",
-        shape="box",
-        style="rounded",
-    )
-    graph.attr("edge", fontname="Arial", fontsize="11")
-    # This will break tests!
-
-    clusterAttr = {
-        "fontname": "Arial",
-        "fontsize": "11",
-        "color": "red",
-        "style": "dashed",
-    }
+    return _dfd(scenes[title], title, dfdLabels=dfdLabels, simplified=simplified)
 
-    boundaryClusters = {}
-
-    # Track which nodes should be placed in which clusters but place neither until we've built the subgraph structure.
-    placements = {}
-
-    # Gather the boundaries and understand how they're nested (but don't nest the graphviz objects ,yet)
-    # Graphviz subgraphs can't have nodes added, so you need to populate a graph with nodes first, then subgraph it under another graph
-    for flow in scenes[title]:
-        for e in (flow.pitcher, flow.catcher):
-            if e.name not in placements.keys():
-                if hasattr(e, "boundary"):
-                    ptr = e
-                    while hasattr(ptr, "boundary"):
-                        if ptr.boundary.name not in boundaryClusters:
-                            boundaryClusters[ptr.boundary.name] = Digraph(
-                                name=f"cluster_{ptr.boundary.name}",
-                                graph_attr=clusterAttr | {"label": ptr.boundary.name},
-                            )
-                        ptr = ptr.boundary
-
-                    placements[e.name] = boundaryClusters[e.boundary.name]
-                else:
-                    placements[e.name] = graph
-
-    # Place nodes in Graphs, ready for subgraphing
-    for n in placements:
-        placements[n].node(n)
-
-    # Subgraph the nodes
-    for c in boundaryClusters:
-        b = Boundary(c)  # The boundary name
-        if hasattr(b, "boundary"):
-            boundaryClusters[b.boundary.name].subgraph(boundaryClusters[c])
-        else:
-            graph.subgraph(boundaryClusters[c])
-
-    # Add the edges
-
-    if simplified is True:
-        edges = (
-            {}
-        )  # Map the edges and figure out if we need to be double or single ended
-        for flow in scenes[title]:
-            # This edge is flow.pitcher.name -> flow.catcher.name
-            # If we don't have this edge, first check to see if we have it the other way
-            if (flow.pitcher.name, flow.catcher.name) not in edges and (
-                flow.catcher.name,
-                flow.pitcher.name,
-            ) not in edges:
-                edges[(flow.pitcher.name, flow.catcher.name)] = "forward"
-            elif (flow.pitcher.name, flow.catcher.name) not in edges and (
-                flow.catcher.name,
-                flow.pitcher.name,
-            ) in edges:
-                edges[(flow.catcher.name, flow.pitcher.name)] = "both"
-
-        for edge in edges:
-            graph.edge(edge[0], edge[1], dir=edges[edge])
-
-    else:  # simplified is False
-        flowCounter = 1
-        for flow in scenes[title]:
-            if dfdLabels is True:
-                graph.edge(
-                    flow.pitcher.name, flow.catcher.name, f"({flowCounter}) {flow.name}"
-                )
-            else:
-                graph.edge(flow.pitcher.name, flow.catcher.name, f"({flowCounter})")
-            flowCounter += 1
-    return graph
 
+# The high level diagram of every flow in every scene, built without rendering anything
+# responses=True draws the response of a flow as an edge back from its catcher
+def aggregate(scenes: dict, responses=False):
+    flows = itertools.chain.from_iterable(scenes.values())
+    if responses:
+        flows = expandResponses(flows)
+    return _dfd(flows, "all", simplified=True)
 
-def dataFlowTable(scenes: dict, key: str, images=False, outputDir=""):
+
+# Builds the DFD with the DOT writer, any iterable of flows (e.g a chain of scenes) will do
+def _dfd(flows, title: str, dfdLabels=True, simplified=False):
+    from graphviz import Digraph
+
+    writer = DfdWriter(title, dfdLabels=dfdLabels, simplified=simplified)
+    return Digraph(title, body=writer.body(flows))
+
+
+# Stream the DOT source of a scene straight to a file like object, for graphs too large to hold
+def writeDfd(scenes: dict, title: str, out, dfdLabels=True, simplified=False):
+    writer = DfdWriter(title, dfdLabels=dfdLabels, simplified=simplified)
+    writer.write(scenes[title], out)
+
+
+# The layers of a flow as record fields for SVG reports. Unlike flatDotRecordString(), used for
+# PNG records, a layer's version is shown when it has one. None and Unset() mean it hasn't.
+def _record(wrappedData):
+    layers = []
+    for layer in wrappedData.getTransportChain():
+        version = layer.version
+        hasVersion = version is not None and not isinstance(version, Unset)
+        layers.append(
+            {
+                "name": layer.__class__.__name__,
+                "version": str(version) if hasVersion else None,
+                "protocolData": [x.__str__() for x in layer.protocolData],
+            }
+        )
+    return {"layers": layers, "data": wrappedData.getNestedData().name}
+
+
+# With images=True each row shows how the flow's data is constructed. For png every flow is
+# rendered as a record diagram, for svg the record is written as an HTML table and nothing is
+# rendered. With format="none" the table falls back to text, as if images were False.
+def dataFlowTable(
+    scenes: dict, key: str, images=False, outputDir="", scheduler=None, format="png"
+):
+    assert format in FORMATS, f"Unknown format: {format}"
     table = []
     flowCounter = 1
     for f in scenes[key]:
@@ -119,9 +97,16 @@ def dataFlowTable(scenes: dict, key: str, images=False, outputDir=""):
             "Catcher": f.catcher.name,
             "Transport Chain": f.wrappedData.getTransportChain(),
             "Data": f.wrappedData.getNestedData(),
+            "Crossing": f.pitcher._registry.crossing(
+                f
+            ),  # Crossing rows are highlighted
         }
 
-        if images == True:
+        if images == True and format == "svg":
+            row["Record"] = _record(f.wrappedData)
+        elif images == True and format == "png":
+            from graphviz import Digraph
+
             # print(f.wrappedData.flatDotRecordString())
             dfGraph = Digraph(
                 filename=f"flow-{_safeFilename(key)}-{flowCounter}",
@@ -142,9 +127,10 @@ def dataFlowTable(scenes: dict, key: str, images=False, outputDir=""):
                 shape="record",
                 label=f.wrappedData.flatDotRecordString(),
             )
-            dfGraph.render(format="png")
-
-            row["Image Source"] = f"flow-{_safeFilename(key)}-{flowCounter}.png"
+            job = RenderJob(
+                dfGraph, dfGraph.filename, directory=outputDir, format="png"
+            )
+            row["Image Source"] = _render(job, scheduler)
 
         table.append(row)
 
@@ -152,15 +138,17 @@ def dataFlowTable(scenes: dict, key: str, images=False, outputDir=""):
     return table
 
 
-def _mixinResponses(scenes, key):
-    newFlows = []
-    for f in scenes[key]:
-        newFlows.append(f)
-        if hasattr(
-            f, "response"
-        ):  # If there's a response, insert it as a new DataFlow object
-            newFlows.append(DataFlow(f.catcher, f.pitcher, f.response))
-    scenes[key][:] = newFlows
+# The scenes as report() draws them, every response following the flow it answers as a flow of
+# its own. A scene is only expanded when it is first looked up and the scenes themselves are left
+# untouched, so report() can be called any number of times on the same model.
+class _WithResponses(dict):
+    def __init__(self, scenes: dict):
+        super().__init__()
+        self.scenes = scenes
+
+    def __missing__(self, key):
+        flows = self[key] = list(expandResponses(self.scenes[key]))
+        return flows
 
 
 def _safeFilename(filename):
@@ -169,46 +157,206 @@ def _safeFilename(filename):
     ).rstrip()
 
 
-def report(scenes: dict, outputDir: str, select=None, dfdLabels=True):
-    if select is None:
-        select = scenes.keys()
-
-    for key in scenes.keys():
-        _mixinResponses(scenes, key)
+# Builds the report for one scene. Its renders go to scheduler unless the manifest shows the
+# scene is unchanged and its output is still on disk.
+def _sceneReport(
+    scenes,
+    key,
+    outputDir,
+    manifest,
+    fingerprint,
+    scheduler,
+    dfdLabels=True,
+    format="png",
+):
+    sceneScheduler = RenderScheduler()
+    graph = dfd(scenes, key, dfdLabels=dfdLabels)
+
+    sceneReport = {
+        "graph": graph,
+        "dfdImage": renderDfd(
+            graph, key, outputDir=outputDir, scheduler=sceneScheduler, format=format
+        ),
+        "dataFlowTable": dataFlowTable(
+            scenes,
+            key,
+            images=True,
+            outputDir=outputDir,
+            scheduler=sceneScheduler,
+            format=format,
+        ),
+    }
 
-    sceneReports = {}
-    for key in select:
-        graph = dfd(scenes, key, dfdLabels=dfdLabels)
-
-        sceneReports[key] = {
-            "graph": graph,
-            "dfdImage": renderDfd(graph, key, outputDir=outputDir),
-            "dataFlowTable": dataFlowTable(
-                scenes, key, images=True, outputDir=outputDir
-            ),
-        }
+    sceneReport["changed"] = (
+        manifest.sceneChanged(key, fingerprint) or not sceneScheduler.done()
+    )
+    if sceneReport["changed"]:
+        scheduler.jobs.extend(sceneScheduler.jobs)
+    manifest.scenes[key] = fingerprint
+    return sceneReport
 
-    compoundFlows = []
-    for flow in scenes.values():
-        compoundFlows = compoundFlows + flow
 
-    agg = dfd({"all": compoundFlows}, "all", simplified=True)
+def _aggregateReport(
+    scenes, outputDir, manifest, fingerprints, scheduler, format="png"
+):
+    aggScheduler = RenderScheduler()
+    agg = aggregate(scenes, responses=True)
     aggDfd = {
         "graph": agg,
-        "dfdImage": renderDfd(agg, "AggregatedDfd", outputDir=outputDir),
+        "dfdImage": renderDfd(
+            agg,
+            "AggregatedDfd",
+            outputDir=outputDir,
+            scheduler=aggScheduler,
+            format=format,
+        ),
     }
 
-    loader = PackageLoader("fluentm", "templates")
-    env = Environment(loader=loader)
-    template = env.get_template("report.html")
-
-    with open(f"{outputDir}/ThreatModel.html", "w") as f:
-        f.write(
-            template.render(
-                {
-                    "title": "Threat Models",
-                    "sceneReports": sceneReports,
-                    "aggregatedDfd": aggDfd,
-                }
+    aggFingerprint = aggregateFingerprint(fingerprints)
+    if manifest.aggregateChanged(aggFingerprint) or not aggScheduler.done():
+        scheduler.jobs.extend(aggScheduler.jobs)
+    manifest.aggregate = aggFingerprint
+    return aggDfd
+
+
+# Writes index.html with the aggregated DFD and a link to a page of its own for every scene.
+# A scene page is only rewritten if the scene changed or the page is missing.
+def _writeSplit(env, context, sceneReports, outputDir):
+    sceneTemplate = env.get_template("scene.html")
+    scenePages = []
+    for key, sceneReport in sceneReports:
+        page = f"scene-{_safeFilename(key)}.html"
+        path = os.path.join(outputDir, page)
+        if sceneReport["changed"] or not os.path.exists(path):
+            stream = sceneTemplate.stream(
+                context, title=key, report=key, scene=sceneReport
             )
+            with open(path, "w") as f:
+                stream.dump(f)
+        scenePages.append((key, page))
+
+    with open(os.path.join(outputDir, "index.html"), "w") as f:
+        env.get_template("index.html").stream(context, scenePages=scenePages).dump(f)
+
+
+# Yields one scene report at a time, rendering its diagrams before it is handed to the template
+# so that nothing from a scene outlives its section of the page
+def _streamSceneReports(
+    scenes, select, outputDir, manifest, fingerprints, scheduler, **options
+):
+    for key in select:
+        sceneReport = _sceneReport(
+            scenes, key, outputDir, manifest, fingerprints[key], scheduler, **options
+        )
+        del sceneReport["graph"]
+        scheduler.run()
+        yield key, sceneReport
+
+
+# workers sets how many graphviz renders run at once, None uses one per CPU
+# batch=True hands many diagrams to each dot process instead of starting one per diagram
+# cache is a RenderCache, or a directory to keep one in, so unchanged diagrams aren't re-rendered
+# incremental=True only renders scenes that changed since the last report() into outputDir
+# stream=True writes ThreatModel.html scene by scene as each one is built and rendered, rather
+#   than holding every scene in memory and rendering the page as one string. Renders are then
+#   batched per scene rather than across the whole report.
+# split=True writes an index.html with the aggregated DFD and one page per scene instead of
+#   ThreatModel.html, with incremental=True only the pages of changed scenes are rewritten
+# lazy=True marks scene images loading="lazy" so browsers fetch them as they scroll into view
+# format="svg" renders DFDs as SVG and writes flow records as HTML tables rather than rendering
+#   an image per flow, format="none" renders nothing and gives a text only report
+def report(
+    scenes: dict,
+    outputDir: str,
+    select=None,
+    dfdLabels=True,
+    workers=1,
+    batch=False,
+    cache=None,
+    incremental=False,
+    stream=False,
+    split=False,
+    lazy=False,
+    format="png",
+):
+    assert format in FORMATS, f"Unknown format: {format}"
+    if select is None:
+        select = scenes.keys()
+
+    # Every graphviz render is queued and run together once the report structure is known
+    if isinstance(cache, str):
+        cache = RenderCache(cache)
+    scheduler = RenderScheduler(workers=workers, batch=batch, cache=cache)
+    cacheCounts = cache.counts() if cache is not None else None
+
+    # Scenes are fingerprinted against the manifest of the previous run, renders for an unchanged
+    # scene are queued on a scheduler of their own and dropped, as long as their output still exists
+    manifest = Manifest.load(outputDir) if incremental else Manifest(outputDir)
+    options = {"dfdLabels": dfdLabels, "format": format}
+    if split:
+        options["lazy"] = lazy  # Scene pages depend on it too
+    fingerprints = {
+        key: sceneFingerprint(flows, **options) for key, flows in scenes.items()
+    }
+
+    drawn = _WithResponses(scenes)
+    sceneOptions = {"dfdLabels": dfdLabels, "format": format}
+    if stream:
+        aggDfd = _aggregateReport(
+            scenes, outputDir, manifest, fingerprints, scheduler, format=format
+        )
+        del aggDfd["graph"]
+        scheduler.run()
+        sceneReports = _streamSceneReports(
+            drawn, select, outputDir, manifest, fingerprints, scheduler, **sceneOptions
         )
+    else:
+        sceneReports = {}
+        for key in select:
+            sceneReports[key] = _sceneReport(
+                drawn,
+                key,
+                outputDir,
+                manifest,
+                fingerprints[key],
+                scheduler,
+                **sceneOptions,
+            )
+        aggDfd = _aggregateReport(
+            scenes, outputDir, manifest, fingerprints, scheduler, format=format
+        )
+        scheduler.run()
+        sceneReports = sceneReports.items()
+
+    # With format="none" nothing has been rendered to create outputDir
+    os.makedirs(outputDir or ".", exist_ok=True)
+
+    from jinja2 import PackageLoader, Environment
+
+    loader = PackageLoader("fluentm", "templates")
+    env = Environment(loader=loader)
+    context = {
+        "title": "Threat Models",
+        "aggregatedDfd": aggDfd,
+        "lazy": lazy,
+    }
+
+    if split:
+        _writeSplit(env, context, sceneReports, outputDir)
+    else:
+        template = env.get_template("report.html")
+        with open(f"{outputDir}/ThreatModel.html", "w") as f:
+            if stream:
+                template.stream(context, sceneReports=sceneReports).dump(f)
+            else:
+                f.write(template.render(context, sceneReports=sceneReports))
+
+    # Only record fingerprints once every scene has been rendered
+    manifest.save()
+
+    # Only this report's use of the cache, it may be shared by several
+    if cache is not None:
+        logging.warning(cache.summary(since=cacheCounts))
+
+    # One summary of everything questionable in the model, rather than a warning per flow
+    diagnostics.emit()
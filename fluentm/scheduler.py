@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import concurrent.futures
+import os
+
+# Upper bound on source files handed to a single dot process, keeps the command line short
+BATCH_SIZE = 256
+
+
+# A single graphviz invocation, captured so that it can be run later
+class RenderJob(object):
+    def __init__(self, graph, filename: str, directory: str = "", format="png"):
+        self.graph = graph
+        self.filename = filename
+        self.directory = directory
+        self.format = format
+
+    # The name of the rendered file, relative to directory. This is what the report links to.
+    @property
+    def outputFile(self):
+        return f"{self.filename}.{self.format}"
+
+    @property
+    def outputPath(self):
+        return os.path.join(self.directory, self.outputFile)
+
+    @property
+    def engine(self):
+        return getattr(self.graph, "engine", "dot")
+
+    def save(self):
+        return self.graph.save(filename=self.filename, directory=self.directory)
+
+    def cacheKey(self, cache):
+        return cache.key(self.graph.source, self.format, self.engine)
+
+    # Copy the output from a RenderCache instead of rendering, returns False on a cache miss
+    def restore(self, cache):
+        if cache.fetch(self.cacheKey(cache), self.format, self.outputPath):
+            self.save()  # Keep the DOT source beside the image, as a render would
+            return True
+        return False
+
+    def store(self, cache):
+        cache.store(self.cacheKey(cache), self.format, self.outputPath)
+
+    def run(self):
+        self.graph.render(
+            filename=self.filename,
+            directory=self.directory,
+            format=self.format,
+            view=False,
+        )
+        return self.outputFile
+
+
+# Several RenderJobs that share an engine, format and directory, rendered by one dot process.
+# dot -O accepts any number of source files and writes <source>.<format> beside each of them,
+# so every job keeps the same output name it would have had if rendered on its own.
+class RenderBatch(object):
+    def __init__(self, jobs: list):
+        self.jobs = jobs
+
+    def run(self):
+        from graphviz import backend  # Not needed until something is rendered
+
+        first = self.jobs[0]
+        cmd, _ = backend.command(first.engine, first.format)
+        cmd.append("-O")
+        cmd.extend(os.path.basename(job.save()) for job in self.jobs)
+        backend.run(cmd, capture_output=True, check=True, cwd=first.directory or None)
+        return [job.outputFile for job in self.jobs]
+
+
+# Module level so that it can be pickled when running on a process pool
+def _runJob(job: RenderJob):
+    return job.run()
+
+
+# Collects RenderJobs and runs them together on a thread or process pool.
+# Each job is a blocking `dot` subprocess, so threads are enough to keep every core busy.
+# With batch=True jobs are grouped so that the fork/exec cost of dot is paid once per batch
+# rather than once per diagram. Given a RenderCache, jobs whose DOT source has been rendered
+# before are copied out of the cache and never reach graphviz.
+class RenderScheduler(object):
+    def __init__(self, workers=1, pool="thread", batch=False, cache=None):
+        assert pool in ("thread", "process"), f"Unknown pool type: {pool}"
+        self.workers = workers
+        self.pool = pool
+        self.batch = batch
+        self.cache = cache
+        self.jobs = []
+
+    def submit(self, job: RenderJob):
+        self.jobs.append(job)
+        return job.outputFile
+
+    def pending(self):
+        # Two jobs writing the same file would race on a pool. Only the last submission
+        # survives when run serially, so keep just that one to keep the output deterministic.
+        last = {}
+        for job in self.jobs:
+            last.pop(job.outputPath, None)
+            last[job.outputPath] = job
+        return list(last.values())
+
+    # True when every queued job's output is already on disk
+    def done(self):
+        return all(os.path.exists(job.outputPath) for job in self.jobs)
+
+    # Group jobs that can share a dot process, split so that every worker gets a batch
+    def batches(self, jobs: list):
+        groups = {}
+        for job in jobs:
+            groups.setdefault((job.engine, job.format, job.directory), []).append(job)
+
+        size = BATCH_SIZE
+        if self.workers != 1:
+            workers = self.workers or os.cpu_count() or 1
+            size = max(1, min(BATCH_SIZE, -(-len(jobs) // workers)))
+
+        batches = []
+        for group in groups.values():
+            for i in range(0, len(group), size):
+                batches.append(RenderBatch(group[i : i + size]))
+        return batches
+
+    def run(self):
+        jobs = self.pending()
+        self.jobs = []
+        outputs = [job.outputFile for job in jobs]
+
+        if self.cache is not None:
+            jobs = [job for job in jobs if not job.restore(self.cache)]
+
+        tasks = self.batches(jobs) if self.batch else jobs
+        if self.workers == 1 or len(tasks) <= 1:
+            for task in tasks:
+                _runJob(task)
+        else:
+            # concurrent.futures loads its pools (and multiprocessing) on first use
+            if self.pool == "thread":
+                executor = concurrent.futures.ThreadPoolExecutor
+            else:
+                executor = concurrent.futures.ProcessPoolExecutor
+            with executor(max_workers=self.workers) as pool:
+                # Consuming map() re-raises the first failure in submission order
+                list(pool.map(_runJob, tasks))
+
+        if self.cache is not None:
+            for job in jobs:
+                job.store(self.cache)
+
+        return outputs
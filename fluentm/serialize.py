@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+from enum import Enum
+import gzip
+import json
+
+from fluentm import entities
+from fluentm.entities import (
+    Asset,
+    DataFlow,
+    ProtocolProperties,
+    Unset,
+    WrappableProtocol,
+    _protocolProperties,
+)
+
+SERIAL_VERSION = 1
+
+# A model saved as JSON lines, so that it can be loaded without running the Python that built it.
+#   dump(scenes, "model.jsonl")
+#   scenes = load("model.jsonl")
+# Paths ending in .gz are compressed. Every type, asset, protocol layer and set of protocol
+# properties is written once into a table of its own and referred to by its index after that:
+#   ["fluentm", 1]                                     header
+#   ["t", "fluentm.entities.Process"]                  type
+#   ["r", [true, false, ...]]                          protocol properties
+#   ["a", type, "Web Server"]                          asset
+#   ["p", type, wraps, properties, [protocol data]]    protocol layer, inner layers come first
+#   ["s", asset, {"boundary": {"$a": 3}}]              asset state
+#   ["f", "Scene", pitcher, catcher, name, layer(, response)]
+# Anything else stored on an asset (e.g a Classification, a list of Credentials) is tagged:
+#   {"$a": asset}, {"$p": layer}, {"$e": [type, value]}, {"$t": [items]}, {"$u": 0} for Unset
+
+
+def _typePath(cls: type):
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+# A model file is data, it can only name the assets, protocols and enums in fluentm.entities.
+# Anything else is refused rather than imported, otherwise a crafted file could call anything.
+def _allowedTypes():
+    return {
+        _typePath(obj): obj
+        for obj in vars(entities).values()
+        if isinstance(obj, type)
+        and obj.__module__ == entities.__name__
+        and issubclass(obj, (Asset, WrappableProtocol, Enum))
+    }
+
+
+def _type(types: list, index: int, base: type):
+    cls = types[index]
+    if not issubclass(cls, base):
+        raise ValueError(f"{_typePath(cls)} used where {base.__name__} expected")
+    return cls
+
+
+def _open(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class _Writer(object):
+    def __init__(self):
+        self.types = {}
+        self.properties = {}
+        self.assets = {}
+        self.layers = {}
+        self.lines = {k: [] for k in "traps"}
+
+    def type(self, cls: type):
+        if cls not in self.types:
+            self.types[cls] = len(self.types)
+            self.lines["t"].append(["t", _typePath(cls)])
+        return self.types[cls]
+
+    def asset(self, asset: Asset):
+        if asset not in self.assets:
+            self.assets[asset] = len(self.assets)
+            self.lines["a"].append(["a", self.type(asset.__class__), asset.name])
+            # State is encoded after the asset has an index, boundaries can refer back to it
+            state = {
+                k: self.value(v)
+                for k, v in asset.__dict__.items()
+                if k not in ("name", "_registry")
+            }
+            if state:
+                self.lines["s"].append(["s", self.assets[asset], state])
+        return self.assets[asset]
+
+    def layer(self, layer: WrappableProtocol):
+        if layer in self.layers:
+            return self.layers[layer]
+
+        # Innermost first so that every layer is written after the one it wraps
+        for l in reversed(layer._walk()):
+            if l in self.layers:
+                continue
+            if l._properties not in self.properties:
+                self.properties[l._properties] = len(self.properties)
+                self.lines["r"].append(["r", [self.value(v) for v in l._properties]])
+            self.lines["p"].append(
+                [
+                    "p",
+                    self.type(l.__class__),
+                    self.value(l.wraps),
+                    self.properties[l._properties],
+                    [self.value(d) for d in l.protocolData],
+                ]
+            )
+            self.layers[l] = len(self.layers)
+        return self.layers[layer]
+
+    def value(self, v):
+        if isinstance(v, Asset):
+            return {"$a": self.asset(v)}
+        if isinstance(v, WrappableProtocol):
+            return {"$p": self.layer(v)}
+        if isinstance(v, Enum):
+            return {"$e": [self.type(v.__class__), v.value]}
+        if isinstance(v, Unset):
+            return {"$u": 0}
+        if isinstance(v, tuple):
+            return {"$t": [self.value(x) for x in v]}
+        if isinstance(v, list):
+            return [self.value(x) for x in v]
+        if v is None or isinstance(v, (str, int, float, bool)):
+            return v
+        raise TypeError(f"Can't serialize {v.__class__.__name__}: {v!r}")
+
+
+def dump(scenes: dict, path: str):
+    writer = _Writer()
+    flows = []
+    for scene, sceneFlows in scenes.items():
+        for flow in sceneFlows:
+            line = [
+                "f",
+                scene,
+                writer.asset(flow.pitcher),
+                writer.asset(flow.catcher),
+                flow.name,
+                writer.layer(flow.wrappedData),
+            ]
+            if hasattr(flow, "response"):
+                line.append(writer.value(flow.response))
+            flows.append(line)
+
+    lines = [["fluentm", SERIAL_VERSION]]
+    for k in "traps":
+        lines.extend(writer.lines[k])
+    lines.extend(flows)
+
+    with _open(path, "w") as f:
+        for line in lines:
+            f.write(json.dumps(line, separators=(",", ":")))
+            f.write("\n")
+
+
+class _Reader(object):
+    def __init__(self):
+        self.types = []
+        self.properties = []
+        self.assets = []
+        self.layers = []
+
+    def value(self, v):
+        if isinstance(v, list):
+            return [self.value(x) for x in v]
+        if not isinstance(v, dict):
+            return v
+        tag, x = next(iter(v.items()))
+        if tag == "$a":
+            return self.assets[x]
+        if tag == "$p":
+            return self.layers[x]
+        if tag == "$e":
+            return _type(self.types, x[0], Enum)(x[1])
+        if tag == "$u":
+            return Unset()
+        if tag == "$t":
+            return tuple(self.value(i) for i in x)
+        raise ValueError(f"Unknown tag {tag}")
+
+    # Built directly rather than through __init__, the same way addProtocolData builds a layer
+    def layer(self, cls, wraps, properties, protocolData):
+        layer = object.__new__(cls)
+        layer.wraps = wraps
+        layer._properties = properties
+        layer.protocolData = protocolData
+        return layer._intern()
+
+    # The boundary and classification go through the methods that keep the registry indexes
+    def state(self, asset, state):
+        for k, v in state.items():
+            v = self.value(v)
+            if k.startswith("_"):
+                raise ValueError(f"Can't set {k} on {asset}")
+            if k == "boundary":
+                asset.inBoundary(v)
+            elif k == "classification":
+                asset.classified(v)
+            else:
+                setattr(asset, k, v)
+
+    def flow(self, pitcher, catcher, name, layer, *response):
+        flow = object.__new__(DataFlow)
+        flow.pitcher = self.assets[pitcher]
+        flow.catcher = self.assets[catcher]
+        flow.name = name
+        flow.wrappedData = self.layers[layer]
+        if response:
+            flow.response = self.value(response[0])
+        return flow
+
+
+# Assets are interned into the active Registry, flows are rebuilt without their warnings
+def load(path: str):
+    reader = _Reader()
+    allowed = _allowedTypes()
+    scenes = {}
+    with _open(path, "r") as f:
+        header = json.loads(f.readline())
+        assert header == ["fluentm", SERIAL_VERSION], f"Not a fluentm model: {path}"
+
+        for line in f:
+            record = json.loads(line)
+            kind = record[0]
+            if kind == "t":
+                if record[1] not in allowed:
+                    raise ValueError(f"{record[1]} is not a fluentm type, in {path}")
+                reader.types.append(allowed[record[1]])
+            elif kind == "r":
+                properties = ProtocolProperties(*reader.value(record[1]))
+                reader.properties.append(
+                    _protocolProperties.setdefault(properties, properties)
+                )
+            elif kind == "a":
+                cls = _type(reader.types, record[1], Asset)
+                reader.assets.append(cls(record[2]))
+            elif kind == "p":
+                _, cls, wraps, properties, protocolData = record
+                reader.layers.append(
+                    reader.layer(
+                        _type(reader.types, cls, WrappableProtocol),
+                        reader.value(wraps),
+                        reader.properties[properties],
+                        tuple(reader.value(protocolData)),
+                    )
+                )
+            elif kind == "s":
+                reader.state(reader.assets[record[1]], record[2])
+            elif kind == "f":
+                scenes.setdefault(record[1], []).append(reader.flow(*record[2:]))
+            else:
+                assert False, f"Unknown record {kind} in {path}"
+    return scenes
@@ -0,0 +1,77 @@
+import os
+
+from fluentm.cache import RenderCache
+from fluentm.entities import DataFlow, Process
+from fluentm.registry import Registry
+from fluentm.renderer import report
+
+
+def _rendered(tmp_path, name, size):
+    p = tmp_path / name
+    p.write_bytes(b"x" * size)
+    return str(p)
+
+
+def test_fetch_after_store(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"))
+    key = cache.key("digraph { A -> B }", "png")
+    dest = str(tmp_path / "out" / "Scene-dfd.png")
+
+    assert cache.fetch(key, "png", dest) is False
+    cache.store(key, "png", _rendered(tmp_path, "render.png", 10))
+    assert cache.fetch(key, "png", dest) is True
+    assert os.path.getsize(dest) == 10
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_key_depends_on_format():
+    cache = RenderCache("unused")
+    assert cache.key("digraph {}", "png") != cache.key("digraph {}", "svg")
+
+
+def test_least_recently_used_evicted(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"), maxBytes=25)
+    keys = [cache.key(f"digraph {{ {i} }}", "png") for i in range(3)]
+    for i, key in enumerate(keys[:2]):
+        cache.store(key, "png", _rendered(tmp_path, f"{i}.png", 10))
+        os.utime(cache.path(key, "png"), (i, i))
+
+    # Using the oldest entry makes the other one the eviction candidate
+    cache.fetch(keys[0], "png", str(tmp_path / "used.png"))
+    cache.store(keys[2], "png", _rendered(tmp_path, "2.png", 10))
+
+    assert os.path.exists(cache.path(keys[0], "png"))
+    assert not os.path.exists(cache.path(keys[1], "png"))
+    assert os.path.exists(cache.path(keys[2], "png"))
+    assert cache.evictions == 1
+
+
+def test_eviction_leaves_headroom(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"), maxBytes=100)
+    for i in range(11):
+        cache.store(cache.key(str(i), "png"), "png", _rendered(tmp_path, "r.png", 10))
+    assert cache.evictions == 3  # Trimmed to 80 bytes, rather than to 100
+    assert cache._size == 80
+
+    # The next store fits without another eviction
+    cache.store(cache.key("next", "png"), "png", _rendered(tmp_path, "r.png", 10))
+    assert cache.evictions == 3
+    assert not [p for p in (tmp_path / "cache").rglob("*.tmp")]
+
+
+def test_report_hits_on_second_run(tmp_path, caplog):
+    cache = RenderCache(str(tmp_path / "cache"))
+    with Registry():
+        scenes = {
+            "Cached": [DataFlow(Process("Cache Client"), Process("Cache Server"), "Hi")]
+        }
+        report(scenes, outputDir=str(tmp_path / "first"), cache=cache)
+        assert "0 hits, 3 misses" in caplog.text
+
+        caplog.clear()
+        report(scenes, outputDir=str(tmp_path / "second"), cache=cache)
+        assert "3 hits, 0 misses" in caplog.text
+
+    for name in ("Cached-dfd.png", "AggregatedDfd-dfd.png", "flow-Cached-1.png"):
+        first = (tmp_path / "first" / name).read_bytes()
+        assert (tmp_path / "second" / name).read_bytes() == first
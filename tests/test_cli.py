@@ -0,0 +1,138 @@
+import os
+import sys
+
+from fluentm.cli import Watcher, main
+
+MODEL = """
+from fluentm.entities import DataFlow, HTTP, Process, TLS
+from cli_helper import server
+
+scenes = {
+    "Login": [DataFlow(Process("CLI Client"), server(), TLS(HTTP("LABEL")))],
+    "Logout": [DataFlow(Process("CLI Client"), server(), TLS(HTTP("Bye")))],
+}
+"""
+
+HELPER = """
+from fluentm.entities import Process
+
+def server():
+    return Process("NAME")
+"""
+
+
+def write(path, text, tick):
+    path.write_text(text)
+    os.utime(path, ns=(tick, tick))  # Make sure the change is visible to the poller
+
+
+def test_watch_once(tmp_path):
+    write(tmp_path / "model.py", MODEL.replace("LABEL", "Hello"), 1_000_000_000)
+    write(
+        tmp_path / "cli_helper.py", HELPER.replace("NAME", "CLI Server"), 1_000_000_000
+    )
+    out = tmp_path / "out"
+
+    assert main(["watch", str(tmp_path / "model.py"), "-o", str(out), "--once"]) == 0
+    assert (out / "ThreatModel.html").exists()
+    assert (out / "Login-dfd.png").exists()
+
+
+def test_watch_rebuilds_changed_scenes(tmp_path):
+    model = tmp_path / "model.py"
+    helper = tmp_path / "cli_helper.py"
+    write(model, MODEL.replace("LABEL", "Hello"), 1_000_000_000)
+    write(helper, HELPER.replace("NAME", "CLI Server"), 1_000_000_000)
+    out = tmp_path / "out"
+
+    watcher = Watcher(str(model), str(out))
+    assert watcher.build()
+    assert str(helper) in watcher.files()
+    assert not watcher.changed()
+
+    login = (out / "Login-dfd").read_text()
+    logout = out / "Logout-dfd.png"
+    os.utime(logout, ns=(1, 1))
+
+    # Only the scene that changed is rendered again
+    write(model, MODEL.replace("LABEL", "Hello again"), 2_000_000_000)
+    assert watcher.changed()
+    assert watcher.build()
+    assert (out / "Login-dfd").read_text() != login
+    assert os.stat(logout).st_mtime_ns == 1
+
+    # A change to a module the model imports is picked up too
+    write(helper, HELPER.replace("NAME", "CLI Backend"), 3_000_000_000)
+    assert watcher.changed()
+    assert watcher.build()
+    assert "CLI Backend" in (out / "Logout-dfd").read_text()
+
+    # A broken model is reported and watched until it's fixed
+    write(model, "scenes = ", 4_000_000_000)
+    assert not watcher.build()
+    assert not watcher.changed()
+
+
+# Both models place the same Process in a different Boundary, if they shared a registry one of
+# them would be drawn in the other's
+GOOD = """
+from fluentm.entities import Boundary, DataFlow, HTTP, Process
+
+scenes = {
+    "Scene": [
+        DataFlow(
+            Process("Build Client"),
+            Process("Build Server").inBoundary(Boundary("Boundary BOUNDARY")),
+            HTTP("Hello"),
+        )
+    ],
+}
+"""
+
+
+def test_build(tmp_path):
+    (tmp_path / "model_a.py").write_text(GOOD.replace("BOUNDARY", "A"))
+    (tmp_path / "model_b.py").write_text(GOOD.replace("BOUNDARY", "B"))
+    out = tmp_path / "out"
+
+    pattern = str(tmp_path / "model_*.py")
+    assert main(["build", pattern, "-o", str(out), "--workers", "2"]) == 0
+    assert (out / "model_a" / "ThreatModel.html").exists()
+    assert 'label="Boundary A"' in (out / "model_a" / "Scene-dfd").read_text()
+    assert 'label="Boundary B"' in (out / "model_b" / "Scene-dfd").read_text()
+    assert 'href="model_b/ThreatModel.html"' in (out / "index.html").read_text()
+
+
+def test_build_failure(tmp_path):
+    (tmp_path / "model_a.py").write_text(GOOD.replace("BOUNDARY", "A"))
+    (tmp_path / "model_broken.py").write_text("scenes = {'Scene': [Unknown]}")
+    out = tmp_path / "out"
+
+    pattern = str(tmp_path / "model_*.py")
+    assert main(["build", pattern, "-o", str(out)]) == 1
+    assert (out / "model_a" / "ThreatModel.html").exists()
+    assert "model_broken failed to build" in (out / "index.html").read_text()
+
+    assert main(["build", str(tmp_path / "missing_*.py"), "-o", str(out)]) == 1
+
+
+# Only modules the model imports from its own directory are forgotten between builds, not ones
+# that share a name with something in it
+def test_watch_leaves_other_modules(tmp_path):
+    import jinja2
+    import logging
+
+    write(tmp_path / "model.py", MODEL.replace("LABEL", "Hi"), 1_000_000_000)
+    write(tmp_path / "cli_helper.py", HELPER.replace("NAME", "Server"), 1_000_000_000)
+    (tmp_path / "logging.py").write_text("raise ImportError('not the stdlib')")
+    (tmp_path / "jinja2").mkdir()
+
+    watcher = Watcher(str(tmp_path / "model.py"), str(tmp_path / "out"))
+    assert watcher.build() and watcher.build()
+    assert sys.modules["logging"] is logging
+    assert sys.modules["jinja2"] is jinja2
+    assert "cli_helper" not in sys.modules
+    assert watcher.files() == [
+        str(tmp_path / "model.py"),
+        str(tmp_path / "cli_helper.py"),
+    ]
@@ -1,5 +1,8 @@
+import io
+
+from fluentm.dot import DfdWriter, quote
 from fluentm.entities import Process, DataFlow
-from fluentm.renderer import dfd, renderDfd
+from fluentm.renderer import aggregate, dfd, renderDfd, writeDfd
 
 scenes = {
     "Test ABC": [
@@ -37,6 +40,22 @@ expectedResults = {
 		E
 	}
 	D -> E [label="(1) Edge 3"]
+}""",
+    "Aggregate": """digraph all {
+	color=blue fontname=Arial rankdir=LR
+	node [fontname=Arial fontsize=11 shape=box style=rounded]
+	edge [fontname=Arial fontsize=11]
+	A
+	B
+	C
+	subgraph cluster_BOUNDARY {
+		graph [color=red fontname=Arial fontsize=11 label=BOUNDARY style=dashed]
+		D
+		E
+	}
+	A -> B [dir=forward]
+	B -> C [dir=both]
+	D -> E [dir=forward]
 }""",
 }
 
@@ -51,3 +70,27 @@ def testABInOneBoundary():
     graph = dfd(scenes, "Test DEInOneBoundary")
     renderDfd(graph, "Test DEInOneBoundary", outputDir="testOutput")
     assert graph.__str__() == expectedResults["Test DEInOneBoundary"]
+
+
+def testAggregate():
+    reversed = {"Test CB": [DataFlow(Process.get("C"), Process.get("B"), "Edge 4")]}
+    graph = aggregate({**scenes, **reversed})
+    assert graph.__str__() == expectedResults["Aggregate"]
+
+
+def testWriteDfd():
+    out = io.StringIO()
+    writeDfd(scenes, "Test ABC", out)
+    assert out.getvalue() == expectedResults["Test ABC"] + "\n"
+
+    # A generator of flows is consumed once but still gives both nodes and edges
+    flows = (f for f in scenes["Test ABC"])
+    assert DfdWriter("Test ABC").source(flows) == expectedResults["Test ABC"]
+
+
+def testQuote():
+    assert quote("A") == "A"
+    assert quote("Web Server") == '"Web Server"'
+    assert quote("node") == '"node"'
+    assert quote('Say "hi"') == '"Say \\"hi\\""'
+    assert quote("<b>html</b>") == "<b>html</b>"
@@ -0,0 +1,36 @@
+import logging
+
+from fluentm.diagnostics import diagnostics
+from fluentm.entities import Data, DataFlow, Process
+
+
+def test_warnings_counted_by_call_site(caplog):
+    diagnostics.emit()
+    caplog.clear()
+
+    for i in range(100):
+        DataFlow(Process("Diag A"), Process("Diag B"), f"Message {i}")
+    DataFlow(Process("Diag A"), Process("Diag B"), Data("Diag Data"))
+
+    assert caplog.records == []  # Nothing is logged while the model is built
+    assert diagnostics.count("string-data") == 100
+    assert diagnostics.count("data-data") == 1
+    assert len(diagnostics.events) == 2
+
+    diagnostics.emit()
+    assert len(caplog.records) == 1
+    assert caplog.records[0].levelno == logging.WARNING
+    assert "101 model warnings" in caplog.text
+    assert "test_diagnostics.py" in caplog.text
+    assert "(100 times)" in caplog.text
+    assert diagnostics.events == {}
+
+
+def test_disabled():
+    diagnostics.enabled = False
+    try:
+        diagnostics.emit()
+        DataFlow(Process("Diag A"), Process("Diag B"), "Ignored")
+        assert diagnostics.events == {}
+    finally:
+        diagnostics.enabled = True
@@ -0,0 +1,83 @@
+from fluentm.entities import Actor, Boundary, Data, DataFlow, HTTP, Process, SQL, TLS
+from fluentm.graph import FlowGraph
+from fluentm.registry import Registry
+
+# Names like "Web" are common to several tests, so the model has a Registry of its own
+registry = Registry("graph")
+with registry:
+    customer = Actor("Customer").inBoundary("Internet")
+    web = Process("Web").inBoundary("DMZ")
+    api = Process("API").inBoundary("Internal")
+    db = Process("Content DB").inBoundary("Internal")
+    audit = Process("Audit")
+    login = DataFlow(customer, web, TLS(HTTP(Data("Password"))))
+    lookup = DataFlow(api, db, SQL("Lookup"), response=SQL("User"))
+    scenes = {
+        "Login": [
+            login,
+            DataFlow(web, api, TLS(HTTP(Data("Password")))),
+            lookup,
+        ],
+        "Browse": [
+            login,  # The same flow in two scenes is one edge
+            lookup,  # and so is its response
+            DataFlow(web, db, SQL("Search")),
+            DataFlow(api, audit, "Log"),
+        ],
+    }
+
+
+def names(entities):
+    return [e.name for e in entities]
+
+
+def test_reachability():
+    g = FlowGraph(scenes)
+    with registry:
+        assert len(g.outgoing[g.number[Actor.get("Customer")]]) == 1
+        assert names(g.reachable(Actor.get("Customer"))) == [
+            "Web",
+            "API",
+            "Content DB",
+            "Audit",
+        ]
+        assert names(g.reachable(Process.get("Audit"))) == []
+        assert "API" in names(g.reachable(Process.get("API")))  # Via Content DB
+        assert names(g.reachable(Process.get("Web"), reverse=True)) == ["Customer"]
+        assert g.canReach(Boundary.get("Internet"), Process.get("Audit"))
+        assert not g.canReach(Process.get("Audit"), Boundary.get("Internet"))
+
+
+def test_paths():
+    g = FlowGraph(scenes)
+    with registry:
+        path = g.shortestPath(Boundary.get("Internet"), Process.get("Content DB"))
+        assert [f.name for f in path] == ["Password", "Search"]
+        assert g.shortestPath(Process.get("Audit"), Process.get("Web")) is None
+
+        paths = g.paths(Boundary.get("Internet"), Process.get("Content DB"))
+        assert sorted([f.name for f in p] for p in paths) == [
+            ["Password", "Password", "Lookup"],
+            ["Password", "Search"],
+        ]
+        short = g.paths(Boundary.get("Internet"), Process.get("Content DB"), 2)
+        assert len(list(short)) == 1
+
+
+def test_lineage():
+    g = FlowGraph(scenes)
+    with registry:
+        password = Data.get("Password")
+        assert len(g.flowsCarrying(password)) == 2
+        assert names(g.lineage(password, transitive=False)) == ["Web", "API"]
+        assert names(g.lineage(password)) == ["Web", "API", "Content DB", "Audit"]
+
+
+def test_responses():
+    g = FlowGraph(scenes)
+    with registry:
+        user = Data.get("User")
+        assert [f.pitcher for f in g.flowsCarrying(user)] == [db]
+        assert names(g.lineage(user, transitive=False)) == ["API"]
+        assert names(g.reachable(db)) == ["API", "Content DB", "Audit"]
+        assert len(g.outgoing[g.number[db]]) == 1
@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+
+# The rendering backends must not be imported until something is rendered
+BACKENDS = ("graphviz", "jinja2", "multiprocessing")
+
+
+# Module name -> cumulative import time in microseconds, as reported by python -X importtime
+def importTimes(module):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_entities_has_no_dependencies():
+    times = importTimes("fluentm.entities")
+    assert "fluentm.entities" in times
+    assert not [m for m in times if m.split(".")[0] in BACKENDS]
+
+
+def test_renderer_loads_backends_lazily():
+    times = importTimes("fluentm.renderer")
+    assert "fluentm.renderer" in times
+    assert not [m for m in times if m.split(".")[0] in BACKENDS]
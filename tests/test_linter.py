@@ -0,0 +1,92 @@
+from fluentm.entities import (
+    Actor,
+    Classification,
+    Data,
+    DataFlow,
+    HTTP,
+    Process,
+    SSH,
+    TLS,
+    Unknown,
+)
+from fluentm.linter import Rule, lint
+from fluentm.registry import Registry
+
+# Built in a registry of its own so that the entity names don't collide with other tests
+registry = Registry("linter")
+with registry:
+    web = Process("Lint Web").inBoundary("Lint DMZ")
+    db = Process("Lint DB").inBoundary("Lint Internal")
+    scenes = {
+        "Lint": [
+            DataFlow(web, db, HTTP("Lint Plain")),
+            DataFlow(web, db, TLS(HTTP("Lint Encrypted"))),
+            DataFlow(web, Process("Lint Cache").inBoundary("Lint DMZ"), "Lint Same"),
+            DataFlow(
+                db,
+                web,
+                TLS(Unknown(Data("Lint Key").classified(Classification.SECRET))),
+            ),
+        ],
+        "Lint Again": [
+            DataFlow(
+                web, db, SSH(Data("Lint Public").classified(Classification.PUBLIC))
+            )
+        ],
+    }
+
+
+def test_default_rules():
+    findings = lint(scenes)
+
+    byCode = {}
+    for f in findings:
+        byCode.setdefault(f.code, []).append(f)
+
+    assert [f.subject.name for f in byCode["plaintext-crossing"]] == ["Lint Plain"]
+    assert [f.subject.name for f in byCode["unknown-transport"]] == ["Lint Key"]
+    assert [f.subject.name for f in byCode["unencrypted-secret"]] == ["Lint Key"]
+    assert byCode["unencrypted-secret"][0].severity == "error"
+    assert byCode["unencrypted-secret"][0].scenes == ["Lint"]
+
+
+def test_custom_rule():
+    rules = [
+        Rule("ssh", "SSH in use", over="protocol", key=SSH),
+        Rule(
+            "unsigned",
+            "Unsigned flow",
+            check=lambda f: f.wrappedData.signed is not True,
+        ),
+        Rule(
+            "encrypted-secret",
+            "Encrypted",
+            over="classification",
+            key=Classification.SECRET,
+            check=lambda d: d.encryptedAtRest is True,
+        ),
+    ]
+    findings = lint(scenes, rules)
+
+    assert [(f.code, f.scenes) for f in findings if f.code == "ssh"] == [
+        ("ssh", ["Lint Again"])
+    ]
+    assert len([f for f in findings if f.code == "unsigned"]) == 4
+    assert not [f for f in findings if f.code == "encrypted-secret"]
+
+
+def test_responses_linted():
+    with Registry():
+        secret = Data("Card").classified(Classification.SECRET)
+        request = DataFlow(
+            Actor("User").inBoundary("Internet"),
+            Process("Web").inBoundary("DMZ"),
+            TLS(HTTP("GET")),
+            response=HTTP(secret),
+        )
+        findings = lint({"Checkout": [request], "Again": [request]})
+
+    byCode = {f.code: f for f in findings}
+    assert byCode["plaintext-crossing"].subject is request.responseFlow()
+    assert byCode["plaintext-crossing"].scenes == ["Checkout", "Again"]
+    assert byCode["unencrypted-secret"].subject is secret
@@ -0,0 +1,82 @@
+import os
+
+from fluentm.entities import Boundary, Process, DataFlow, TLS, HTTP
+from fluentm.manifest import Manifest, sceneFingerprint
+from fluentm.registry import Registry
+from fluentm.renderer import report
+
+
+def test_fingerprint_tracks_boundaries():
+    flows = [
+        DataFlow(
+            Process("Manifest Client"),
+            Process("Manifest Server").inBoundary(Boundary("Manifest Inner")),
+            TLS(HTTP("Manifest request")),
+        )
+    ]
+    before = sceneFingerprint(flows)
+    assert sceneFingerprint(flows) == before
+    assert sceneFingerprint(flows, dfdLabels=False) != before
+
+    Boundary("Manifest Inner").inBoundary(Boundary("Manifest Outer"))
+    assert sceneFingerprint(flows) != before
+
+
+def test_manifest_round_trip(tmp_path):
+    manifest = Manifest(str(tmp_path))
+    manifest.scenes["Scene"] = "abc"
+    manifest.aggregate = "def"
+    manifest.save()
+
+    loaded = Manifest.load(str(tmp_path))
+    assert not loaded.sceneChanged("Scene", "abc")
+    assert loaded.sceneChanged("Scene", "xyz")
+    assert loaded.sceneChanged("Other", "abc")
+    assert not loaded.aggregateChanged("def")
+
+
+def test_missing_manifest_is_empty(tmp_path):
+    assert Manifest.load(str(tmp_path / "nothing")).scenes == {}
+
+
+def test_incremental_report_skips_unchanged_scenes(tmp_path):
+    out = tmp_path / "out"
+
+    def build(label):
+        with Registry():
+            client, server = Process("Inc Client"), Process("Inc Server")
+            scenes = {
+                "Inc Same": [DataFlow(client, server, "Unchanged")],
+                "Inc Changed": [DataFlow(server, client, label)],
+            }
+            report(scenes, outputDir=str(out), incremental=True)
+
+    build("Before")
+    same = [out / "Inc Same-dfd.png", out / "flow-Inc Same-1.png"]
+    changed = [out / "Inc Changed-dfd.png", out / "flow-Inc Changed-1.png"]
+    for p in same + changed:
+        os.utime(p, ns=(1, 1))
+
+    build("After")
+    assert all(os.stat(p).st_mtime_ns == 1 for p in same)
+    assert all(os.stat(p).st_mtime_ns != 1 for p in changed)
+    assert "After" in (out / "Inc Changed-dfd").read_text()
+
+
+def test_split_page_rewritten_when_version_changes(tmp_path):
+    out = tmp_path / "out"
+
+    def build(version):
+        with Registry():
+            flow = DataFlow(
+                Process("Ver Client"),
+                Process("Ver Server"),
+                TLS(HTTP("Ver"), version=version),
+            )
+            options = {"split": True, "incremental": True, "format": "svg"}
+            report({"s": [flow]}, outputDir=str(out), **options)
+        return (out / "scene-s.html").read_text()
+
+    assert "+1.2" in build("1.2")
+    page = build("1.3")
+    assert "+1.3" in page and "+1.2" not in page
@@ -0,0 +1,56 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from fluentm.entities import Boundary, DataFlow, HTTP, Process
+from fluentm.model import Model
+from fluentm.registry import activeRegistry
+
+
+def bookstore(m: Model, boundary: str):
+    m.scenes["Browse"] = [
+        DataFlow(
+            Process("Web").inBoundary(Boundary("Internet")),
+            Process("Store").inBoundary(Boundary(boundary)),
+            HTTP("GET /books"),
+        )
+    ]
+    return m
+
+
+def test_models_are_isolated():
+    with Model("one") as one:
+        bookstore(one, "Back End")
+        store = Process.get("Store")
+
+    with Model("two") as two:
+        bookstore(two, "Data Centre")
+        assert Process.get("Store") is not store
+
+    assert store.boundary is one.get("Boundary", "Back End")
+    assert two.get("Process", "Store").boundary.name == "Data Centre"
+    assert two.get("Boundary", "Internet") is not one.get("Boundary", "Internet")
+
+
+def test_nested_models():
+    outer = activeRegistry()
+    with Model("one") as one:
+        with Model("two") as two:
+            assert activeRegistry() is two.registry
+        assert activeRegistry() is one.registry
+    assert activeRegistry() is outer
+
+
+def test_models_in_threads(tmp_path):
+    def build(i):
+        with Model(f"model {i}") as m:
+            bookstore(m, f"Boundary {i}")
+        m.report(str(tmp_path / str(i)), format="none")
+        return m
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        models = list(pool.map(build, range(8)))
+
+    for i, m in enumerate(models):
+        assert m.get("Process", "Store").boundary.name == f"Boundary {i}"
+        assert len(m.registry) == 5  # Two processes, two boundaries and the data
+        assert m.graph().canReach(m.get("Process", "Web"), m.get("Process", "Store"))
+        assert (tmp_path / str(i) / "ThreatModel.html").exists()
@@ -0,0 +1,75 @@
+import sys
+
+import pytest
+
+from fluentm.entities import (
+    Actor,
+    CyclicProtocolError,
+    Data,
+    DataFlow,
+    HTTP,
+    IPSEC,
+    MTLSVPN,
+    TLS,
+    TLSVPN,
+)
+from fluentm.registry import Registry
+
+
+def test_protocols_are_slotted():
+    flow = DataFlow(Actor("Slotted Alice"), Actor("Slotted Bob"), TLS(HTTP("Hi")))
+    assert not hasattr(flow, "__dict__")
+    assert not hasattr(flow.wrappedData, "__dict__")
+    assert not hasattr(flow, "response")
+
+
+def test_properties_shared_per_class():
+    a, b = TLS("a"), TLS("b")
+    assert a._properties is b._properties
+    assert a.encrypted is True and a.version == "1.2"
+    assert TLS("c", version="1.3")._properties is not a._properties
+
+
+def test_protocol_data_not_shared():
+    a = HTTP("a")
+    withHeader = a.addProtocolData(Data("Header"))
+    assert withHeader is not a
+    assert withHeader.protocolData == (Data.get("Header"),)
+    assert a.protocolData == ()
+    assert withHeader.flatDotRecordString() == "HTTP|{Header}|{a}"
+    assert HTTP("a").addProtocolData(Data("Header")) is withHeader
+
+
+def test_identical_stacks_shared():
+    stack = TLS(HTTP("Shared request"))
+    assert TLS(HTTP("Shared request")) is stack
+    assert TLS(HTTP("Shared request"), version="1.3") is not stack
+    assert stack.flatDotRecordString() is stack.flatDotRecordString()
+    assert stack.getTransportChain() == [stack, stack.wraps]
+
+
+def test_vpn_protocols_construct():
+    for protocol in (IPSEC, TLSVPN, MTLSVPN):
+        assert protocol("Tunnelled").encrypted is True
+
+
+# Layers are built with type.__call__ so that they skip the intern table, the cycle mustn't leak
+# into layers built by other tests
+def test_cycle_raises():
+    with Registry():
+        inner = type.__call__(HTTP, "Cyclic request")
+        outer = type.__call__(TLS, inner)
+    assert HTTP("Cyclic request") is not inner
+
+    inner.wraps = outer
+    with pytest.raises(CyclicProtocolError):
+        outer.getNestedData()
+
+
+def test_deep_chain_beyond_recursion_limit():
+    layer = HTTP("Deep request")
+    for _ in range(sys.getrecursionlimit() * 2):
+        layer = TLS(layer)
+    assert layer.getNestedData() is Data.get("Deep request")
+    assert len(layer.getTransportChain()) == sys.getrecursionlimit() * 2 + 1
+    assert layer.flatString().endswith("Deep request" + " )" * len(layer._chain))
@@ -0,0 +1,207 @@
+from concurrent.futures import ThreadPoolExecutor
+import sys
+import threading
+
+from fluentm.entities import (
+    Actor,
+    Boundary,
+    Classification,
+    Credential,
+    Data,
+    DataFlow,
+    HTTP,
+    Process,
+    TLS,
+)
+from fluentm.diagnostics import Diagnostics
+from fluentm.registry import Registry, activeRegistry, defaultRegistry
+
+
+def test_interned_by_type_and_name():
+    with Registry():
+        customer = Actor("Customer")
+        assert Actor("Customer") is customer
+        assert Actor.get("Customer") is customer
+        assert Process("Customer") is not customer
+
+
+def test_repeat_lookup_keeps_state():
+    with Registry():
+        Data("Card number").isEncryptedAtRest()
+        assert Data("Card number").encryptedAtRest is True
+
+
+def test_secondary_indexes():
+    with Registry() as r:
+        Boundary("Databases").inBoundary("BookStore Co")
+        Process("Content DB").inBoundary("Databases")
+        Process("Stock DB").inBoundary("Databases")
+        Data("Password").classified(Classification.SECRET)
+
+        assert r.entitiesIn(Boundary.get("Databases")) == [
+            Process.get("Content DB"),
+            Process.get("Stock DB"),
+        ]
+        assert r.childBoundaries(Boundary.get("BookStore Co")) == [
+            Boundary.get("Databases")
+        ]
+        assert r.childBoundaries() == [Boundary.get("BookStore Co")]
+        assert r.classifiedAs(Classification.SECRET) == [Data.get("Password")]
+
+        # Moving an entity updates the index it left
+        Process("Stock DB").inBoundary("BookStore Co")
+        assert r.entitiesIn(Boundary.get("Databases")) == [Process.get("Content DB")]
+
+
+def test_cross_type_lookup():
+    with Registry() as r:
+        Actor("Internet")
+        Boundary("Internet")
+        assert [a.__class__.__name__ for a in r.lookup("Internet")] == [
+            "Actor",
+            "Boundary",
+        ]
+
+
+def test_scoped_registries_are_isolated():
+    with Registry() as outer:
+        web = Process("Web Server")
+        with Registry() as inner:
+            assert activeRegistry() is inner
+            assert Process("Web Server") is not web
+        assert activeRegistry() is outer
+        assert Process("Web Server") is web
+    assert activeRegistry() is defaultRegistry
+
+
+def test_reset():
+    with Registry() as r:
+        Process("Web Server")
+        assert len(r) == 1
+        r.reset()
+        assert len(r) == 0
+
+
+def test_boundary_tree():
+    with Registry() as r:
+        Boundary("Front End Systems").inBoundary("BookStore Co")
+        Boundary("Databases").inBoundary("BookStore Co")
+        Process("Web Server").inBoundary("Front End Systems")
+        Process("Content DB").inBoundary("Databases")
+        Actor("Customer").inBoundary("Internet")
+
+        tree = r.boundaryTree()
+        store, front = Boundary.get("BookStore Co"), Boundary.get("Front End Systems")
+        assert tree.parent[front] is store
+        assert tree.depth[front] == 1 and tree.depth[store] == 0
+        assert tree.chain(front) == (front, store)
+        assert tree.descendants(store) == [front, Boundary.get("Databases")]
+        assert tree.entitiesUnder(store) == [
+            Process.get("Web Server"),
+            Process.get("Content DB"),
+        ]
+        assert r.boundaryTree() is tree
+
+        # Nesting a boundary invalidates the cached tree
+        Boundary("Internet").inBoundary("World")
+        assert r.boundaryTree() is not tree
+        assert r.boundaryTree().depth[Boundary.get("Internet")] == 1
+
+
+def test_crossing_index():
+    with Registry() as r:
+        Boundary("Cross DMZ").inBoundary("Cross Cloud")
+        Boundary("Cross DB").inBoundary("Cross Internal")
+        Boundary("Cross Internal").inBoundary("Cross Cloud")
+        web = Process("Cross Web").inBoundary("Cross DMZ")
+        db = Process("Cross Store").inBoundary("Cross DB")
+        user = Actor("Cross User")
+
+        inward = DataFlow(web, db, "Query")
+        crossing = r.crossing(inward)
+        assert crossing.exited == (Boundary.get("Cross DMZ"),)
+        assert crossing.entered == (
+            Boundary.get("Cross Internal"),
+            Boundary.get("Cross DB"),
+        )
+        assert crossing.crosses
+
+        browse = DataFlow(user, web, "Browse")
+        assert r.crossing(browse).exited == ()
+        assert r.crossing(browse).entered == (
+            Boundary.get("Cross Cloud"),
+            Boundary.get("Cross DMZ"),
+        )
+
+        assert not r.crossing(DataFlow(db, db, "Local")).crosses
+
+        # Moving an entity or a boundary updates the flows that touch it
+        db.inBoundary("Cross DMZ")
+        assert not r.crossing(inward).crosses
+
+        Boundary("Cross DMZ").inBoundary("Cross Internal")
+        assert r.crossing(browse).entered == (
+            Boundary.get("Cross Cloud"),
+            Boundary.get("Cross Internal"),
+            Boundary.get("Cross DMZ"),
+        )
+
+
+# 16 threads build the same model at once, every one of them must get the same objects. A small
+# switch interval makes threads interleave inside the registry as often as possible.
+def test_threaded_interning():
+    threads, names = 16, 500
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    barrier = threading.Barrier(threads)
+    diagnostics = Diagnostics()
+
+    def build(r, t):
+        with r:
+            barrier.wait()
+            built = []
+            for i in range(names):
+                web = Process(f"Web {i}").inBoundary(Boundary(f"VPC {i % 10}"))
+                web.processesData(Data(f"Record {i}"))
+                web.addCredential(Credential(f"Key {t}"))
+                flow = DataFlow(web, Process("DB"), TLS(HTTP(f"Query {i}")))
+                diagnostics.record("threaded")
+                built.append((web, Boundary(f"VPC {i % 10}"), flow.wrappedData))
+            return built
+
+    try:
+        with Registry() as r:
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                results = list(pool.map(build, [r] * threads, range(threads)))
+    finally:
+        sys.setswitchinterval(interval)
+
+    # Every thread got the same objects
+    for built in results[1:]:
+        assert all(a is b for x, y in zip(results[0], built) for a, b in zip(x, y))
+
+    # Process and Data per name, a Boundary per VPC, a Credential per thread and the DB
+    assert len(r) == names * 3 + 10 + threads + 1
+    assert len(r.childBoundaries()) == 10
+    assert (
+        sum(len(r.entitiesIn(r.get("Boundary", f"VPC {i}"))) for i in range(10))
+        == names
+    )
+
+    web = r.get("Process", "Web 0")
+    assert len(web.processedData) == threads
+    assert len(web.credentials) == threads
+    assert diagnostics.count("threaded") == threads * names
+
+
+def test_registry_entered_from_threads():
+    r = Registry()
+
+    def build(i):
+        with r:
+            return Process(f"Worker {i}")
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        workers = list(pool.map(build, range(100)))
+    assert r.assets("Process") == workers
+    assert activeRegistry() is defaultRegistry
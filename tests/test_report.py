@@ -0,0 +1,115 @@
+from fluentm.entities import Boundary, Data, Process, DataFlow, TCP, TLS, HTTP
+from fluentm.renderer import _record, report
+
+scenes = {
+    "Report Login": [
+        DataFlow(
+            Process("Report Client"),
+            Process("Report Server").inBoundary(Boundary("Report Backend")),
+            TLS(HTTP("Login")),
+        ),
+    ],
+    "Report Logout": [
+        DataFlow(Process.get("Report Client"), Process.get("Report Server"), "Logout"),
+    ],
+}
+
+
+def test_stream_matches_render(tmp_path):
+    report(scenes, outputDir=str(tmp_path / "render"))
+    report(scenes, outputDir=str(tmp_path / "stream"), stream=True)
+
+    rendered = (tmp_path / "render" / "ThreatModel.html").read_text()
+    streamed = (tmp_path / "stream" / "ThreatModel.html").read_text()
+    assert streamed == rendered
+    assert "Report Logout" in streamed
+    assert (tmp_path / "stream" / "Report Logout-dfd.png").exists()
+
+
+def test_split_pages(tmp_path):
+    out = tmp_path / "split"
+    report(scenes, outputDir=str(out), split=True, lazy=True, incremental=True)
+
+    index = (out / "index.html").read_text()
+    assert 'href="scene-Report Login.html"' in index
+    assert 'href="scene-Report Logout.html"' in index
+    assert not (out / "ThreatModel.html").exists()
+
+    page = out / "scene-Report Logout.html"
+    assert 'loading="lazy"' in page.read_text()
+
+    # Unchanged scenes keep their page, missing pages are written again
+    page.write_text("untouched")
+    (out / "scene-Report Login.html").unlink()
+    report(scenes, outputDir=str(out), split=True, lazy=True, incremental=True)
+    assert page.read_text() == "untouched"
+    assert (out / "scene-Report Login.html").exists()
+
+
+def test_svg_inlines_records(tmp_path):
+    out = tmp_path / "svg"
+    report(scenes, outputDir=str(out), format="svg")
+
+    assert (out / "Report Login-dfd.svg").exists()
+    assert (out / "AggregatedDfd-dfd.svg").exists()
+    assert not list(out.glob("flow-*"))  # Records are HTML tables, never rendered
+
+    html = (out / "ThreatModel.html").read_text()
+    assert '<table class="record">' in html
+    assert "<td>TLS<br/>+1.2</td>" in html
+    assert "<td>Login</td>" in html
+
+
+def test_no_render(tmp_path):
+    out = tmp_path / "none"
+    report(scenes, outputDir=str(out), format="none")
+
+    assert sorted(p.name for p in out.iterdir()) == [
+        ".fluentm-manifest.json",
+        "ThreatModel.html",
+    ]
+    html = (out / "ThreatModel.html").read_text()
+    assert "<img" not in html
+    assert "<th>Transport</th>" in html
+
+
+def test_report_leaves_scenes_untouched(tmp_path):
+    withResponse = {
+        "Report Reply": [
+            DataFlow(
+                Process.get("Report Client"),
+                Process.get("Report Server"),
+                TLS(HTTP("Ask")),
+                response=TLS(HTTP("Answer")),
+            )
+        ]
+    }
+    report(withResponse, outputDir=str(tmp_path / "first"))
+    report(withResponse, outputDir=str(tmp_path / "second"))
+    assert len(withResponse["Report Reply"]) == 1
+
+    first = (tmp_path / "first" / "ThreatModel.html").read_text()
+    second = (tmp_path / "second" / "ThreatModel.html").read_text()
+    assert first == second
+    assert "<td>2<" in first and "<td>3<" not in first  # Flow, then its response
+
+    dot = (tmp_path / "second" / "AggregatedDfd-dfd").read_text()
+    assert '"Report Client" -> "Report Server" [dir=both]' in dot
+
+
+def test_crossing_rows_highlighted(tmp_path):
+    report(scenes, outputDir=str(tmp_path), format="none")
+
+    # Both flows go into Report Backend
+    html = (tmp_path / "ThreatModel.html").read_text()
+    assert html.count('<tr class="crossing">') == 2
+    assert "<small>Crosses Report Backend</small>" in html
+
+
+def test_record_versions():
+    record = _record(TLS(HTTP(Data("Versioned")), version="1.3"))
+    assert [(l["name"], l["version"]) for l in record["layers"]] == [
+        ("TLS", "1.3"),
+        ("HTTP", "2.0"),
+    ]
+    assert _record(TCP("Unversioned"))["layers"][0]["version"] is None
@@ -0,0 +1,87 @@
+import threading
+
+from graphviz import Digraph
+
+from fluentm.entities import DataFlow, Process
+from fluentm.registry import Registry
+from fluentm.renderer import report
+from fluentm.scheduler import RenderJob, RenderScheduler
+
+
+# Stands in for a graphviz Digraph, records what would have been rendered
+class RecordingGraph(object):
+    def __init__(self, rendered):
+        self.rendered = rendered
+        self.lock = threading.Lock()
+
+    def render(self, filename, directory, format, view):
+        with self.lock:
+            self.rendered.append(f"{directory}/{filename}.{format}")
+
+
+def test_results_in_submission_order():
+    rendered = []
+    graph = RecordingGraph(rendered)
+    scheduler = RenderScheduler(workers=4)
+    names = [scheduler.submit(RenderJob(graph, f"flow-{i}", "out")) for i in range(20)]
+
+    assert scheduler.run() == names
+    assert sorted(rendered) == sorted(f"out/{n}" for n in names)
+    assert scheduler.jobs == []
+
+
+def test_duplicate_outputs_render_once():
+    first, last = [], []
+    scheduler = RenderScheduler(workers=2)
+    scheduler.submit(RenderJob(RecordingGraph(first), "Scene-dfd", "out"))
+    scheduler.submit(RenderJob(RecordingGraph(last), "Scene-dfd", "out"))
+    scheduler.run()
+
+    assert first == []
+    assert last == ["out/Scene-dfd.png"]
+
+
+def test_batches_split_across_workers():
+    scheduler = RenderScheduler(workers=2, batch=True)
+    for i in range(5):
+        scheduler.submit(RenderJob(None, f"flow-Scene-{i}", "out"))
+    scheduler.submit(RenderJob(None, "Scene-dfd", "out", format="svg"))
+
+    batches = scheduler.batches(scheduler.pending())
+    assert [len(b.jobs) for b in batches] == [3, 2, 1]
+    assert [j.filename for j in batches[0].jobs] == [
+        "flow-Scene-0",
+        "flow-Scene-1",
+        "flow-Scene-2",
+    ]
+
+
+def test_batches_render_every_output(tmp_path):
+    out = str(tmp_path)
+    scheduler = RenderScheduler(workers=2, batch=True)
+    for i in range(5):
+        graph = Digraph(body=[f"\tA{i} -> B{i}\n"])
+        scheduler.submit(RenderJob(graph, f"flow-Scene-{i}", out))
+    scheduler.submit(RenderJob(Digraph(body=["\tA -> B\n"]), "Scene-dfd", out, "svg"))
+
+    names = scheduler.run()
+    assert names == [f"flow-Scene-{i}.png" for i in range(5)] + ["Scene-dfd.svg"]
+    for name in names:
+        assert (tmp_path / name).exists()
+        assert (tmp_path / name[: name.rindex(".")]).exists()  # The DOT source
+
+
+def test_report_in_batches(tmp_path):
+    with Registry():
+        scenes = {
+            "Batched": [
+                DataFlow(Process("Batch Client"), Process("Batch Server"), "Ask"),
+                DataFlow(Process("Batch Server"), Process("Batch Client"), "Answer"),
+            ]
+        }
+        report(scenes, outputDir=str(tmp_path / "one"))
+        report(scenes, outputDir=str(tmp_path / "batched"), workers=2, batch=True)
+
+    one = sorted(p.name for p in (tmp_path / "one").iterdir())
+    assert sorted(p.name for p in (tmp_path / "batched").iterdir()) == one
+    assert "flow-Batched-2.png" in one
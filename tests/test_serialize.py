@@ -0,0 +1,84 @@
+import json
+import logging
+
+import pytest
+
+from fluentm.entities import (
+    Boundary,
+    Classification,
+    Credential,
+    Data,
+    DataFlow,
+    HTTP,
+    Process,
+    TLS,
+)
+from fluentm.manifest import sceneFingerprint
+from fluentm.registry import Registry
+from fluentm.serialize import dump, load
+
+# Saved from a registry of its own, and loaded into another
+registry = Registry("serialize")
+with registry:
+    Boundary("Serial Inner").inBoundary("Serial Outer")
+    key = Data("Serial Key").classified(Classification.SECRET)
+    server = (
+        Process("Serial Server")
+        .inBoundary("Serial Inner")
+        .processesData(key)
+        .addCredential(Credential("Serial Cert").isAsymmetric())
+    )
+    scenes = {
+        "Serial": [
+            DataFlow(
+                Process("Serial Client"),
+                server,
+                TLS(HTTP("Request")).addProtocolData(Data("Serial Cert")),
+                response=TLS(HTTP("Reply")),
+            ),
+            DataFlow(server, Process("Serial Client"), "Plain"),
+        ]
+    }
+
+
+def test_round_trip(tmp_path, caplog):
+    path = str(tmp_path / "model.jsonl.gz")
+    fingerprint = sceneFingerprint(scenes["Serial"])
+    dump(scenes, path)
+
+    caplog.clear()
+    with Registry() as r, caplog.at_level(logging.WARNING):
+        loaded = load(path)
+        assert caplog.records == []  # No warnings for the string data flow
+        assert sceneFingerprint(loaded["Serial"]) == fingerprint
+
+        server = Process.get("Serial Server")
+        assert r.entitiesIn(Boundary.get("Serial Inner")) == [server]
+        assert r.childBoundaries(Boundary.get("Serial Outer")) == [
+            Boundary.get("Serial Inner")
+        ]
+        assert r.classifiedAs(Classification.SECRET) == [Data.get("Serial Key")]
+        assert server.credentials == [Credential.get("Serial Cert")]
+        assert server.credentials[0].asymmetric is True
+
+        # Protocol layers are interned as if they had been built by hand
+        flow = loaded["Serial"][0]
+        assert flow.response is TLS(HTTP("Reply"))
+        assert flow.wrappedData.protocolData == (Data.get("Serial Cert"),)
+
+
+def test_load_refuses_other_types(tmp_path):
+    def write(*records):
+        path = tmp_path / "model.jsonl"
+        lines = [["fluentm", 1]] + list(records)
+        path.write_text("\n".join(json.dumps(line) for line in lines))
+        return str(path)
+
+    for record in (["t", "os.system"], ["t", "fluentm.entities.DataFlow"]):
+        with Registry(), pytest.raises(ValueError, match="not a fluentm type"):
+            load(write(record))
+
+    # Only an Asset can be interned as one
+    enum = ["t", "fluentm.entities.Classification"]
+    with Registry(), pytest.raises(ValueError, match="used where Asset expected"):
+        load(write(enum, ["a", 0, "SECRET"]))